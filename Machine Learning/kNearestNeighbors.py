@@ -1,9 +1,9 @@
-import pandas as pd 
 import numpy as np
 import math
 from sklearn.datasets import load_iris 
 from sklearn.neighbors import KNeighborsClassifier 
 from sklearn.model_selection import train_test_split 
+from mLFuncs import loadDataset
 
 """About this task: I want to get a feel for the k nearest neighbor algorithm and experiment with the Iris dataset.
 First I'm going to use the sklearn iris dataset and KNN objects to establish a baseline and get some experience using this tool (this will be largly a copy-paste job from IMLP).
@@ -35,14 +35,13 @@ print("Sklearn default KNN test score: {:.2f}".format(np.mean(y_pred == y_test))
 
 #all right now I'll give it a crack with no help from sklearn
 #Open another copy of the iris dataset. and split it into data and targets
-data=pd.read_csv('iris.data').to_numpy()
-stripped=data[:,:4]
-flowers=data[:,-1]
+#loadDataset parses iris.data once into a float feature matrix and integer labels (flowerNames[label] is the cultivar) and memory-maps that cache afterwards
+stripped,flowers,flowerNames=loadDataset('iris.data')
 percents=np.array([])
 
 #randomly assign rows to be either training or test data
 trainingPercent=0.75
-indices=np.arange(0,len(data))
+indices=np.arange(0,len(stripped))
 np.random.shuffle(indices)
 
 trainingIndices=indices[:math.floor(len(indices)*trainingPercent)]
@@ -0,0 +1,89 @@
+import numpy as np
+import json
+import time
+import platform
+import argparse
+from mLFuncs import loopNeighbors, bruteForceNeighbors, kdTree, kNeighborsClassifier
+
+"""About this task:
+The timing experiment in nearestNeighborTests.py times reading iris.data, the imports and load_iris() along with the actual algorithm,
+so the 'N times slower than sklearn' number there is mostly I/O noise.  This file benchmarks just the nearest neighbor searches.
+
+Data sets are random normal points generated up front for every combination of training set size, query count, dimension and k.
+For each search path the build (fit) step and the query step are timed separately, each after a few untimed warmup runs, and repeated
+to get a minimum and median time.  The paths are:
+-loop: the pure python reference loop (loopNeighbors).  Only run on small problems as it is very slow
+-vectorized: blocked numpy distances with top-k selection (bruteForceNeighbors)
+-classifier: kNeighborsClassifier with precomputed training norms
+-kdtree: kdTree built once then queried
+
+Results are written as json (one record per case and path) so runs from different versions can be diffed to spot regressions.
+Run with -h for the options.
+"""
+
+#largest n_train*n_query the loop path is run on
+loopLimit=200000
+
+def timeCall(function,warmup,repeats):
+    #runs function warmup times untimed then repeats times timed.  Returns the min and median seconds and the result of the last call
+    for i in range(warmup):
+        result=function()
+    times=np.empty(repeats)
+    for i in range(repeats):
+        start=time.perf_counter()
+        result=function()
+        times[i]=time.perf_counter()-start
+    return float(np.min(times)),float(np.median(times)),result
+
+def searchPaths():
+    #each path is (name, build, query) where build(trainingData) returns whatever query(built,queryData,k) needs
+    return [
+        ('loop',lambda X:X,lambda built,Q,k:loopNeighbors(Q,built,k=k)),
+        ('vectorized',lambda X:np.ascontiguousarray(X,dtype=float),lambda built,Q,k:bruteForceNeighbors(Q,built,k=k)),
+        ('classifier',lambda X:kNeighborsClassifier().fit(X,np.zeros(len(X))),lambda built,Q,k:built.kneighbors(Q,k=k)),
+        ('kdtree',lambda X:kdTree(X),lambda built,Q,k:built.query(Q,k=k)),
+    ]
+
+def runBenchmark(nTrains,nQueries,dims,ks,warmup=1,repeats=5,seed=0):
+    rng=np.random.default_rng(seed)
+    records=[]
+    for nTrain in nTrains:
+        for nQuery in nQueries:
+            for dim in dims:
+                #data generation is kept out of every timed section
+                trainingData=rng.standard_normal((nTrain,dim))
+                queryData=rng.standard_normal((nQuery,dim))
+                for k in ks:
+                    reference=None
+                    for name,build,query in searchPaths():
+                        if name=='loop' and nTrain*nQuery>loopLimit:
+                            continue
+                        buildMin,buildMedian,built=timeCall(lambda:build(trainingData),warmup,repeats)
+                        queryMin,queryMedian,result=timeCall(lambda:query(built,queryData,k),warmup,repeats)
+                        #sanity check that every path agrees with the first one run on the same case
+                        if reference is None:
+                            reference=result[1]
+                        records.append({'path':name,'nTrain':nTrain,'nQuery':nQuery,'dim':dim,'k':k,
+                                        'buildMin':buildMin,'buildMedian':buildMedian,'queryMin':queryMin,'queryMedian':queryMedian,
+                                        'queriesPerSecond':nQuery/queryMin,'matchesReference':bool(np.array_equal(result[1],reference))})
+                        print('{:>10} nTrain={:<7} nQuery={:<6} dim={:<3} k={:<4} build={:.5f}s query={:.5f}s'.format(name,nTrain,nQuery,dim,k,buildMin,queryMin))
+    return records
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Benchmark the nearest neighbor searches in mLFuncs')
+    parser.add_argument('--nTrain',type=int,nargs='+',default=[1000,10000])
+    parser.add_argument('--nQuery',type=int,nargs='+',default=[100,1000])
+    parser.add_argument('--dim',type=int,nargs='+',default=[4,16])
+    parser.add_argument('--k',type=int,nargs='+',default=[1,10])
+    parser.add_argument('--warmup',type=int,default=1)
+    parser.add_argument('--repeats',type=int,default=5)
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--output',default='knnBenchmarkResults.json')
+    args=parser.parse_args()
+
+    records=runBenchmark(args.nTrain,args.nQuery,args.dim,args.k,warmup=args.warmup,repeats=args.repeats,seed=args.seed)
+    results={'python':platform.python_version(),'numpy':np.__version__,'machine':platform.machine(),
+             'time':time.strftime('%Y-%m-%dT%H:%M:%S'),'settings':vars(args),'results':records}
+    with open(args.output,'w') as f:
+        json.dump(results,f,indent=1)
+    print('\nresults written to {}'.format(args.output))
@@ -1,14 +1,25 @@
 import pandas as pd 
 import numpy as np
 import math
+import heapq
+import os
+import json
+import threading
+import queue
+import time
+import sys
+import tracemalloc
+from multiprocessing import Pool, shared_memory
 
 #functions and their derivatives for use in neural net
 #using sigmoid for activatio nfunction and sum of squared errors for cost function
+#sigmoid is written as e^-log(1+e^-x) (np.logaddexp(0,-x) is log(1+e^-x) without overflowing) so large negative inputs don't overflow
 def sigmoid(x):
-    return 1/(1+np.power(np.e,-x))
+    return np.exp(-np.logaddexp(0,-x))
 
 def dSigmoid(x):
-    return ((np.power(np.e,-x))/(np.power(1+np.power(np.e,-x),2)))
+    s=sigmoid(x)
+    return s*(1-s)
 
 def inverseSigmoid(x):
     return np.log(x/(1-x))
@@ -19,21 +30,63 @@ def sumSquaredErrors(y,yHat):
 def dSumSquaredErrors(y,yHat):
     return 2*(y-yHat)/len(y)
 
+#activation functions for batchTrainer.  Each one has a forward kernel and a derivative that is computed from the forward output
+#(which the trainer already has stored) rather than from the layer values, so backpropagation never recomputes an exponential.
+#Both write into out when it is given so the trainer can reuse its buffers
+class sigmoidActivation:
+    def forward(self,x,out=None):
+        out=np.negative(x,out=out)
+        np.logaddexp(0,out,out=out)
+        np.negative(out,out=out)
+        return np.exp(out,out=out)
+
+    def derivative(self,s,out=None):
+        #sigmoid'(x)=s(1-s)
+        out=np.subtract(1,s,out=out)
+        return np.multiply(out,s,out=out)
+
+class tanhActivation:
+    def forward(self,x,out=None):
+        return np.tanh(x,out=out)
+
+    def derivative(self,t,out=None):
+        #tanh'(x)=1-t^2
+        out=np.square(t,out=out)
+        return np.subtract(1,out,out=out)
+
+class reluActivation:
+    def forward(self,x,out=None):
+        return np.maximum(x,0,out=out)
+
+    def derivative(self,r,out=None):
+        #1 where the unit is active, 0 otherwise
+        if out is None:
+            return (r>0).astype(r.dtype)
+        return np.greater(r,0,out=out)
+
+activationFunctions={'sigmoid':sigmoidActivation(),'tanh':tanhActivation(),'relu':reluActivation()}
+
+def getActivation(activation):
+    #accepts either the name of an activation in activationFunctions or an activation object
+    if isinstance(activation,str):
+        return activationFunctions[activation]
+    return activation
 
 class neuralNetwork:
-    def __init__(self,x,y,nLayers=2,nNodes=3,lossFunction=sumSquaredErrors):
+    def __init__(self,x,y,nLayers=2,nNodes=3,lossFunction=sumSquaredErrors,dtype=np.float64):
         #initialize a bunch of matrices the number and shape of which are determined by the shape of input/output layers and 
+        #dtype is the floating point type of the weights, which the batch training and predict methods also compute in (np.float32 halves memory traffic)
         self.input=np.reshape(x,(len(x),1))
         self.x=x
         self.nLayers=nLayers
         self.nNodes=nNodes
         self.weights=[]
         self.y=y
-        self.firstWeight=np.random.rand(nNodes,len(self.input))
+        self.firstWeight=np.random.rand(nNodes,len(self.input)).astype(dtype)
         self.weights.append(self.firstWeight)
         for i in range(nLayers-1):
-            self.weights.append(np.random.rand(nNodes,nNodes))
-        self.lastWeight=np.random.rand(len(self.y),nNodes)
+            self.weights.append(np.random.rand(nNodes,nNodes).astype(dtype))
+        self.lastWeight=np.random.rand(len(self.y),nNodes).astype(dtype)
         self.weights.append(self.lastWeight)
 
     def feedForward(self,activationFunction=sigmoid):
@@ -51,14 +104,22 @@ class neuralNetwork:
                 self.layers.append(np.dot(weight,self.activations[-1]))
                 self.activations.append(activationFunction(self.layers[-1]))
 
-    def backProp(self,dActivationFunction,dCostFunction,activationFunction):
+    def backProp(self,dActivationFunction=None,dCostFunction=dSumSquaredErrors,activationFunction=sigmoid):
         #Perform backPropagation by calculating derivative of each weight with respect to the cost function
+        #With dActivationFunction=None the sigmoid's derivative s(1-s) is taken from the activations feedForward stored, so no exponential is recomputed.
+        #Passing a derivative function of the layer values (eg. dSigmoid) overrides this
+        def derivative(j):
+            #derivative of the activation function at layers[j].  activations has the input in front so activations[j] (j counting from the end) is the activation of layers[j]
+            if dActivationFunction is None:
+                s=self.activations[j]
+                return s*(1-s)
+            return dActivationFunction(self.layers[j])
         self.dWeightsReversed=[]
         self.dAdCostReversed=[]
         #the first (technically last) weight derivative matrix is calculated seperately as the backpropagation process is iterative so we need a starting point.
         dAdCost=dCostFunction(activationFunction(self.y),self.activations[-1])
         self.dAdCostReversed.append(dAdCost)
-        dLdC=dAdCost*dSigmoid(self.layers[-1])
+        dLdC=dAdCost*derivative(-1)
         dLdCT=np.array([dLdC]).T
         self.dWeightsReversed.append(dLdCT*self.activations[-2])
         self.weights[-1]+=self.dWeightsReversed[0]
@@ -68,108 +129,987 @@ class neuralNetwork:
             i=-i-1
             #derivative of this activation (A) with respect to previous activation (Ap)
             #note that we're looping through activations backwards so the "previous" activation is a higher index activation
-            dAdC=np.dot(self.weights[i].T,dActivationFunction(np.array([self.layers[i]]).T)*self.dAdCostReversed[-1])
+            dAdC=np.dot(self.weights[i].T,np.array([derivative(i)]).T*self.dAdCostReversed[-1])
             self.dAdCostReversed.append(dAdC)
-            dWdA=np.array([dActivationFunction(self.layers[i-1])]).T*self.activations[i-2]
+            dWdA=np.array([derivative(i-1)]).T*self.activations[i-2]
             self.dWeightsReversed.append(dWdA)
             self.weights[i-1]+=self.dWeightsReversed[-1]
 
-def kNearestNeighbors(data, labels, testData=None, trainingData=None,trainingLabels=None,testLabels=None, mode='mixed',labelled=True,trainingPercent=0.75,k=1):
-    if mode=='mixed':
-        #randomly assign data to test or training
-        indices=np.arange(0,len(data))
-        np.random.shuffle(indices)
+    def feedForwardBatch(self,X,activation='sigmoid'):
+        #feedForward for a whole (nSamples x nInputs) matrix at once.  Each row of X is one sample so every layer is a single matrix product
+        #and batchLayers/batchActivations hold one row per sample.  activation is a name from activationFunctions or an activation object
+        activation=getActivation(activation)
+        self.batchLayers=[]
+        self.batchActivations=[np.asarray(X,dtype=self.weights[0].dtype)]
+        for weight in self.weights:
+            self.batchLayers.append(np.dot(self.batchActivations[-1],weight.T))
+            self.batchActivations.append(activation.forward(self.batchLayers[-1]))
+        return self.batchActivations[-1]
+
+    def backPropBatch(self,Y,learningRate=1,activation='sigmoid'):
+        #backPropagation for the batch last passed to feedForwardBatch.  Like backProp the cost is the sum of squared errors between the output activations
+        #and activation(Y), here averaged over the samples in the batch.
+        #delta is the derivative of the cost with respect to a layer (before the activation function) for every sample, starting at the output.
+        #It is pushed back through each weight matrix before that matrix is updated, and it is negative the gradient so the weights are updated with +=.
+        #The activation's derivative is taken from the stored batchActivations, as in batchTrainer, so no exponential is recomputed
+        activation=getActivation(activation)
+        Y=np.asarray(Y,dtype=self.weights[0].dtype)
+        output=self.batchActivations[-1]
+        delta=2*(activation.forward(Y)-output)/(output.shape[1]*output.shape[0])
+        delta*=activation.derivative(output)
+        for i in range(len(self.weights)-1,-1,-1):
+            dWeight=np.dot(delta.T,self.batchActivations[i])
+            if i>0:
+                delta=np.dot(delta,self.weights[i])*activation.derivative(self.batchActivations[i])
+            self.weights[i]+=learningRate*dWeight
+
+    def trainBatch(self,X,Y,batchSize=32,nEpochs=1000,learningRate=1,shuffle=True,seed=None,activation='sigmoid',tol=None,patience=None,minDelta=0,profile=False):
+        #trains on a (nSamples x nInputs) matrix X and (nSamples x nOutputs) matrix Y in mini-batches of batchSize rows.
+        #Every epoch visits each sample once, in a new random order if shuffle is True.
+        #The work is done by a batchTrainer so the steps reuse the same buffers rather than allocating new arrays.
+        #activation is a name from activationFunctions or an activation object.  See trainEpochs for the loss curve, early stopping and profile options
+        X=np.ascontiguousarray(X,dtype=self.weights[0].dtype)
+        Y=np.ascontiguousarray(np.reshape(Y,(len(X),-1)),dtype=self.weights[0].dtype)
+        trainer=batchTrainer(self,min(batchSize,len(X)),activation=activation)
+        rng=np.random.default_rng(seed)
+        order=np.arange(len(X))
+        def epochBatches():
+            if shuffle:
+                rng.shuffle(order)
+            for start in range(0,len(X),batchSize):
+                yield X,Y,order[start:start+batchSize]
+        return self.trainEpochs(trainer,epochBatches,nEpochs,learningRate,tol,patience,minDelta,profile)
+
+    def trainStream(self,stream,nEpochs=1,learningRate=1,activation='sigmoid',tol=None,patience=None,minDelta=0,profile=False):
+        #trains on mini-batches from a csvBatchStream (or anything that can be iterated over once per epoch to give (X,Y) batches of at most
+        #stream.batchSize rows), so the training data never has to fit in memory.  See trainEpochs for the loss curve, early stopping and profile options
+        trainer=batchTrainer(self,stream.batchSize,activation=activation)
+        rows=np.arange(stream.batchSize)
+        def epochBatches():
+            for X,Y in stream:
+                yield X,Y,rows[:len(X)]
+        return self.trainEpochs(trainer,epochBatches,nEpochs,learningRate,tol,patience,minDelta,profile)
+
+    def trainEpochs(self,trainer,epochBatches,nEpochs,learningRate,tol,patience,minDelta,profile=False,allocationSamples=3):
+        #runs trainer.step on every (X,Y,rows) batch epochBatches() gives, nEpochs times.
+        #The loss of each epoch is the average cost of its samples, taken from the errors the training steps already computed, and is stored in
+        #self.lossCurve (allocated for nEpochs up front and cut down to the epochs actually run).  Training stops early once the epoch loss is
+        #below tol, or once it has gone patience epochs without improving on the best loss so far by more than minDelta.  Returns self.lossCurve.
+        #With profile=True it returns (self.lossCurve,self.trainingReport) instead, see trainingReport
+        lossCurve=np.empty(nEpochs)
+        bestLoss=np.inf
+        sinceBest=0
+        if profile:
+            trainer.startTimings()
+            totalSamples=0
+            steps=0
+            allocations=[]
+            started=time.perf_counter()
+        #so nEpochs=0 gives an empty loss curve
+        epoch=-1
+        for epoch in range(nEpochs):
+            epochLoss=0
+            nSamples=0
+            for X,Y,rows in epochBatches():
+                if profile and 0<steps<=allocationSamples:
+                    #a few steps (after the first, which may still be warming up) are run under tracemalloc to measure their allocations
+                    #their time is left out of the report since tracing slows them down
+                    stepStart=time.perf_counter()
+                    timings=trainer.timings
+                    trainer.timings=None
+                    allocations.append(self.traceAllocations(trainer,X,Y,rows,learningRate))
+                    epochLoss+=allocations[-1].pop('loss')
+                    trainer.timings=timings
+                    started+=time.perf_counter()-stepStart
+                else:
+                    epochLoss+=trainer.step(X,Y,rows,learningRate=learningRate)
+                    if profile:
+                        totalSamples+=len(rows)
+                if profile:
+                    steps+=1
+                nSamples+=len(rows)
+            lossCurve[epoch]=epochLoss/nSamples
+            if tol is not None and lossCurve[epoch]<tol:
+                break
+            if lossCurve[epoch]<bestLoss-minDelta:
+                bestLoss=lossCurve[epoch]
+                sinceBest=0
+            else:
+                sinceBest+=1
+                if patience is not None and sinceBest>=patience:
+                    break
+        self.lossCurve=lossCurve[:epoch+1]
+        if not profile:
+            return self.lossCurve
+        seconds=time.perf_counter()-started
+        timings=trainer.timings
+        trainer.timings=None
+        #trainingReport: seconds and samplesPerSecond are for the timed steps, the per layer phase times are totals over those steps, and
+        #allocation figures are averages over the traced steps: retainedBlocksPerStep is how many more memory blocks python holds after a step than
+        #before it.  It is not a count of allocations, a temporary array that is allocated and freed within the step doesn't show up in it.
+        #Those temporaries are what peakBytesPerStep measures: the most memory the step's allocations held at once (0 if it allocates nothing but small python objects)
+        self.trainingReport={'steps':steps,'timedSamples':totalSamples,'seconds':seconds,'samplesPerSecond':totalSamples/seconds if seconds>0 else np.inf,
+                             'forwardSeconds':timings['forward'],'outputSeconds':timings['output'],'backwardSeconds':timings['backward'],'updateSeconds':timings['update'],
+                             'tracedSteps':len(allocations),
+                             'retainedBlocksPerStep':np.mean([a['retainedBlocks'] for a in allocations]) if allocations else np.nan,
+                             'peakBytesPerStep':np.mean([a['peakBytes'] for a in allocations]) if allocations else np.nan}
+        return self.lossCurve,self.trainingReport
+
+    def traceAllocations(self,trainer,X,Y,rows,learningRate):
+        #runs one training step under tracemalloc and returns its loss, the change in the number of allocated memory blocks (blocks the step kept,
+        #not how many allocations it made) and the peak bytes allocated on top of what was in use when it started
+        tracing=tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        before=tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        blocksBefore=sys.getallocatedblocks()
+        loss=trainer.step(X,Y,rows,learningRate=learningRate)
+        peak=tracemalloc.get_traced_memory()[1]
+        blocks=sys.getallocatedblocks()-blocksBefore
+        if not tracing:
+            tracemalloc.stop()
+        return {'loss':loss,'retainedBlocks':blocks,'peakBytes':peak-before}
+
+    def predict(self,X,activation='sigmoid'):
+        #runs a whole (nSamples x nInputs) matrix through the current weights in one pass and returns the (nSamples x nOutputs) output activations.
+        #A single sample can be passed as a vector, in which case a single output vector is returned
+        activation=getActivation(activation)
+        X=np.asarray(X,dtype=self.weights[0].dtype)
+        output=np.atleast_2d(X)
+        for weight in self.weights:
+            output=activation.forward(np.dot(output,weight.T))
+        return output[0] if X.ndim==1 else output
+
+    def saveWeights(self,path):
+        #writes the weight list to one binary file: an int64 header of [number of matrices, dtype character code, rows and columns of each matrix]
+        #followed by the raw values of every matrix in order.  loadNetwork memory-maps it back
+        dtype=np.dtype(self.weights[0].dtype)
+        header=[len(self.weights),ord(dtype.char)]
+        for weight in self.weights:
+            header+=list(weight.shape)
+        with open(path,'wb') as f:
+            f.write(np.array(header,dtype=np.int64).tobytes())
+            for weight in self.weights:
+                f.write(np.ascontiguousarray(weight,dtype=dtype).tobytes())
+
+    @classmethod
+    def fromWeights(cls,weights):
+        #builds a network around an existing list of weight matrices without drawing new random weights
+        net=cls.__new__(cls)
+        net.weights=list(weights)
+        net.firstWeight=net.weights[0]
+        net.lastWeight=net.weights[-1]
+        net.nLayers=len(net.weights)-1
+        net.nNodes=net.weights[0].shape[0]
+        net.x=np.zeros(net.weights[0].shape[1])
+        net.input=np.reshape(net.x,(len(net.x),1))
+        net.y=np.zeros(net.weights[-1].shape[0])
+        return net
+
+def loadNetwork(path,mode='r'):
+    #loads a network saved with neuralNetwork.saveWeights.  The weights are views into one memory-mapped file so loading is instant and
+    #nothing is read from disk until it is used.  mode='r' is read only (for inference), 'c' is copy on write (can be trained without changing the file)
+    count,code=np.fromfile(path,dtype=np.int64,count=2)
+    shapes=np.fromfile(path,dtype=np.int64,count=2+2*count)[2:].reshape(count,2)
+    values=np.memmap(path,dtype=np.dtype(chr(code)),mode=mode,offset=8*(2+2*count))
+    weights=[]
+    start=0
+    for rows,columns in shapes:
+        weights.append(values[start:start+rows*columns].reshape(rows,columns))
+        start+=rows*columns
+    return neuralNetwork.fromWeights(weights)
+
+class batchTrainer:
+    #the mini-batch training step of neuralNetwork.feedForwardBatch/backPropBatch, but with every per-layer array allocated once for the network's shape
+    #and batchSize.  Each step then works in those buffers with out= and in-place operations so a training step allocates (almost) nothing.
+    #The weights are updated in place so net.weights always holds the current weights.
+    #For a batch smaller than batchSize (the end of an epoch) the first rows of each buffer are used.
+    #activation is a name from activationFunctions or an activation object.  Its derivative is taken from the stored activations
+    def __init__(self,net,batchSize,activation='sigmoid'):
+        self.net=net
+        self.batchSize=batchSize
+        self.activation=getActivation(activation)
+        sizes=[net.weights[0].shape[1]]+[weight.shape[0] for weight in net.weights]
+        #every buffer has the weights' dtype so a float32 network stays float32 all the way through
+        dtype=net.weights[0].dtype
+        #activations[0] is the input batch, layers[i]/activations[i+1] are the output of weights[i] before/after the activation function
+        self.activations=[np.empty((batchSize,size),dtype=dtype) for size in sizes]
+        self.layers=[np.empty((batchSize,size),dtype=dtype) for size in sizes[1:]]
+        #deltas[i] is the (negative) derivative of the cost with respect to layers[i] and derivatives[i] is the activation function's derivative there
+        self.deltas=[np.empty((batchSize,size),dtype=dtype) for size in sizes[1:]]
+        self.derivatives=[np.empty((batchSize,size),dtype=dtype) for size in sizes[1:]]
+        self.dWeights=[np.empty_like(weight) for weight in net.weights]
+        self.target=np.empty((batchSize,sizes[-1]),dtype=dtype)
+
+        #seconds spent in each phase of each layer, only recorded while timings is not None (see startTimings)
+        self.timings=None
+
+    def startTimings(self):
+        #turns on per phase timing: forward[i], backward[i] and update[i] are the seconds spent on weights[i], output the time spent on the cost and output delta
+        nWeights=len(self.net.weights)
+        self.timings={'forward':np.zeros(nWeights),'output':0.0,'backward':np.zeros(nWeights),'update':np.zeros(nWeights)}
+
+    def step(self,X,Y,batch,learningRate=1):
+        #one forward and backward pass over the rows batch of X and Y, followed by the weight update.
+        #Returns the summed cost of the batch (before the update), computed from the output error the backward pass needs anyway.
+        #When timings is None the only instrumentation cost is checking that once per phase
+        n=len(batch)
+        weights=self.net.weights
+        activation=self.activation
+        timings=self.timings
+        if timings is not None:
+            start=time.perf_counter()
+        #mode='clip' lets np.take write straight into out (the default mode='raise' gathers into a temporary copy first).  batch is always in range
+        np.take(X,batch,axis=0,out=self.activations[0][:n],mode='clip')
+        for i,weight in enumerate(weights):
+            np.dot(self.activations[i][:n],weight.T,out=self.layers[i][:n])
+            activation.forward(self.layers[i][:n],out=self.activations[i+1][:n])
+            if timings is not None:
+                now=time.perf_counter()
+                timings['forward'][i]+=now-start
+                start=now
+
+        #output delta: 2*(activation(Y)-output)/(nOutputs*n)*activation'(output layer)
+        target=self.target[:n]
+        np.take(Y,batch,axis=0,out=target,mode='clip')
+        activation.forward(target,out=target)
+        delta=self.deltas[-1][:n]
+        np.subtract(target,self.activations[-1][:n],out=delta)
+        #sum of squared errors over the batch as a dot product of the error with itself so no squared copy is made
+        flatError=delta.reshape(-1)
+        loss=np.dot(flatError,flatError)/target.shape[1]
+        delta*=2/(target.shape[1]*n)
+        delta*=activation.derivative(self.activations[-1][:n],out=self.derivatives[-1][:n])
+        if timings is not None:
+            now=time.perf_counter()
+            timings['output']+=now-start
+            start=now
+
+        for i in range(len(weights)-1,-1,-1):
+            delta=self.deltas[i][:n]
+            np.dot(delta.T,self.activations[i][:n],out=self.dWeights[i])
+            if i>0:
+                #push delta back through weights[i] before it is updated
+                previous=self.deltas[i-1][:n]
+                np.dot(delta,weights[i],out=previous)
+                previous*=activation.derivative(self.activations[i][:n],out=self.derivatives[i-1][:n])
+            if timings is not None:
+                now=time.perf_counter()
+                timings['backward'][i]+=now-start
+                start=now
+            self.dWeights[i]*=learningRate
+            weights[i]+=self.dWeights[i]
+            if timings is not None:
+                now=time.perf_counter()
+                timings['update'][i]+=now-start
+                start=now
+        return loss
+
+class networkEnsemble:
+    #trains M neuralNetworks of the same shape together.  The weights of every member are stacked into one (M x nOut x nIn) array per layer
+    #so a forward or backward pass for all members is one batched matrix product (np.matmul) per layer instead of M python loops.
+    #learningRates can be a single value or one per member.  Every member sees the same mini-batches, so members differ through their
+    #starting weights (seeds) and learning rates.  unstack() copies the trained weights back into the original networks
+    def __init__(self,nets,activation='sigmoid'):
+        shapes=[[weight.shape for weight in net.weights] for net in nets]
+        if any(shape!=shapes[0] for shape in shapes):
+            raise ValueError('every network in an ensemble must have the same shape')
+        self.nets=nets
+        self.activation=getActivation(activation)
+        self.weights=[np.stack([net.weights[i] for net in nets]) for i in range(len(nets[0].weights))]
+        self.dtype=self.weights[0].dtype
+
+    def feedForward(self,X):
+        #X is either one (nSamples x nInputs) matrix shared by every member or an (M x nSamples x nInputs) stack.  Returns the activations of every layer
+        X=np.asarray(X,dtype=self.dtype)
+        activations=[np.broadcast_to(X,(len(self.nets),)+X.shape[-2:])]
+        for weight in self.weights:
+            activations.append(self.activation.forward(np.matmul(activations[-1],weight.transpose(0,2,1))))
+        return activations
+
+    def predict(self,X):
+        #(M x nSamples x nOutputs) output activations of every member
+        return self.feedForward(X)[-1]
+
+    def loss(self,X,Y):
+        #per member cost: squared error against activation(Y) summed over outputs divided by the number of outputs, averaged over samples
+        output=self.predict(X)
+        target=self.activation.forward(np.asarray(Y,dtype=self.dtype).reshape(output.shape[1],-1))
+        return np.mean(np.sum(np.square(target-output),axis=2),axis=1)/output.shape[2]
+
+    def train(self,X,Y,batchSize=32,nEpochs=1000,learningRates=1,shuffle=True,seed=None):
+        #same training loop as neuralNetwork.trainBatch run for every member at once.  Returns an (nEpochs x M) array of each member's
+        #loss in every epoch, taken from the forward passes already done for training (so it is the loss of each batch before its update)
+        X=np.ascontiguousarray(X,dtype=self.dtype)
+        Y=np.ascontiguousarray(np.reshape(Y,(len(X),-1)),dtype=self.dtype)
+        rates=np.broadcast_to(np.asarray(learningRates,dtype=self.dtype),(len(self.nets),))[:,np.newaxis,np.newaxis]
+        rng=np.random.default_rng(seed)
+        order=np.arange(len(X))
+        losses=np.zeros((nEpochs,len(self.nets)))
+        for epoch in range(nEpochs):
+            if shuffle:
+                rng.shuffle(order)
+            for start in range(0,len(X),batchSize):
+                batch=order[start:start+batchSize]
+                activations=self.feedForward(X[batch])
+                output=activations[-1]
+                target=self.activation.forward(Y[batch])
+                error=target-output
+                losses[epoch]+=np.sum(np.square(error),axis=(1,2))/output.shape[2]
+                delta=2*error/(output.shape[2]*len(batch))*self.activation.derivative(output)
+                for i in range(len(self.weights)-1,-1,-1):
+                    dWeight=np.matmul(delta.transpose(0,2,1),activations[i])
+                    if i>0:
+                        delta=np.matmul(delta,self.weights[i])*self.activation.derivative(activations[i])
+                    self.weights[i]+=rates*dWeight
+            losses[epoch]/=len(X)
+        return losses
+
+    def unstack(self):
+        #copy the trained weights back into the member networks
+        for m,net in enumerate(self.nets):
+            for i,weight in enumerate(self.weights):
+                net.weights[i][...]=weight[m]
+        return self.nets
+
+def batchGradients(weights,X,Y,activation,batchLength):
+    #forward and backward pass of a network with the given weights over the rows of X and Y.  Returns the (negative) gradient of each weight matrix
+    #scaled for a mini-batch of batchLength rows, so the gradients of the shards of a batch add up to the gradient of the whole batch
+    activations=[X]
+    for weight in weights:
+        activations.append(activation.forward(np.dot(activations[-1],weight.T)))
+    output=activations[-1]
+    delta=2*(activation.forward(Y)-output)/(output.shape[1]*batchLength)*activation.derivative(output)
+    dWeights=[None]*len(weights)
+    for i in range(len(weights)-1,-1,-1):
+        dWeights[i]=np.dot(delta.T,activations[i])
+        if i>0:
+            delta=np.dot(delta,weights[i])*activation.derivative(activations[i])
+    return dWeights
+
+#training data and weights each parallelTrain worker attaches to in attachSharedNetwork
+sharedNetwork={}
+
+def attachSharedNetwork(specs):
+    #pool initializer: specs maps 'X', 'Y' and 'weights' to the (name,shape,dtype) of shared memory blocks ('weights' to a list of them, one per layer)
+    sharedNetwork['blocks']=[]
+    def attach(name,shape,dtype):
+        block=shared_memory.SharedMemory(name=name)
+        sharedNetwork['blocks'].append(block)
+        return np.ndarray(shape,dtype=dtype,buffer=block.buf)
+    sharedNetwork['X']=attach(*specs['X'])
+    sharedNetwork['Y']=attach(*specs['Y'])
+    sharedNetwork['weights']=[attach(*spec) for spec in specs['weights']]
+
+def gradientWorker(task):
+    rows,batchLength,activation=task
+    return batchGradients(sharedNetwork['weights'],sharedNetwork['X'][rows],sharedNetwork['Y'][rows],activation,batchLength)
+
+def sharedCopy(array):
+    #copies array into a new shared memory block and returns the block and an array view of it
+    block=shared_memory.SharedMemory(create=True,size=max(array.nbytes,1))
+    view=np.ndarray(array.shape,dtype=array.dtype,buffer=block.buf)
+    view[...]=array
+    return block,view
+
+def parallelTrain(net,X,Y,nWorkers=2,nShards=None,batchSize=32,nEpochs=1000,learningRate=1,shuffle=True,seed=None,activation='sigmoid'):
+    #data parallel version of neuralNetwork.trainBatch.  X, Y and the weights are copied into shared memory once.  Every mini-batch is cut into nShards
+    #(nWorkers by default) pieces in a fixed order, a pool of nWorkers processes computes the gradients of the pieces, and the driver adds them
+    #up in shard order and updates the shared weights in place, which every worker sees on its next task.
+    #Because the shards and the order they are added in only depend on nShards, a fixed nShards gives exactly the same weights for any nWorkers,
+    #and matches trainBatch with the same seed up to rounding.  The trained weights are copied back into net.weights
+    dtype=net.weights[0].dtype
+    X=np.ascontiguousarray(X,dtype=dtype)
+    Y=np.ascontiguousarray(np.reshape(Y,(len(X),-1)),dtype=dtype)
+    if nShards is None:
+        nShards=nWorkers
+    activation=getActivation(activation)
+    blocks=[]
+    try:
+        xBlock,sharedX=sharedCopy(X)
+        blocks.append(xBlock)
+        yBlock,sharedY=sharedCopy(Y)
+        blocks.append(yBlock)
+        weights=[]
+        for weight in net.weights:
+            block,view=sharedCopy(np.asarray(weight,dtype=dtype))
+            blocks.append(block)
+            weights.append(view)
+        specs={'X':(xBlock.name,X.shape,dtype),'Y':(yBlock.name,Y.shape,dtype),'weights':[(block.name,weight.shape,dtype) for block,weight in zip(blocks[2:],weights)]}
+
+        rng=np.random.default_rng(seed)
+        order=np.arange(len(X))
+        with Pool(nWorkers,initializer=attachSharedNetwork,initargs=(specs,)) as pool:
+            for epoch in range(nEpochs):
+                if shuffle:
+                    rng.shuffle(order)
+                for start in range(0,len(X),batchSize):
+                    batch=order[start:start+batchSize]
+                    tasks=[(shard,len(batch),activation) for shard in np.array_split(batch,nShards) if len(shard)>0]
+                    results=pool.map(gradientWorker,tasks)
+                    #fixed order reduction: shard 0 first, then 1, ...
+                    for i,weight in enumerate(weights):
+                        dWeight=results[0][i]
+                        for result in results[1:]:
+                            dWeight+=result[i]
+                        dWeight*=learningRate
+                        weight+=dWeight
+        for weight,view in zip(net.weights,weights):
+            weight[...]=view
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return net
+
+def loadDataset(path,labelColumn=-1,cacheDir=None):
+    #loads a headerless csv of numeric feature columns plus one label column as a float64 feature matrix, an integer label array and the
+    #label names (so labels[i] is the index of its name in classNames).  The first load parses the csv and saves features and labels as .npy files in
+    #cacheDir (a .datasetCache folder next to the csv by default).  Later loads memory-map those instead of parsing the csv again.
+    #The cache records the csv's size and modification time and the label column, and is rebuilt whenever they change
+    if cacheDir is None:
+        cacheDir=os.path.join(os.path.dirname(os.path.abspath(path)),'.datasetCache')
+    name=os.path.basename(path)
+    featurePath=os.path.join(cacheDir,name+'.features.npy')
+    labelPath=os.path.join(cacheDir,name+'.labels.npy')
+    metaPath=os.path.join(cacheDir,name+'.meta.json')
+    stat=os.stat(path)
+    source={'size':stat.st_size,'mtime':stat.st_mtime_ns}
+    #the label column is stored counted from the front so -1 and its positive index on the same file share a cache
+    nColumns=len(pd.read_csv(path,header=None,nrows=1).columns)
+    labelColumn=labelColumn%nColumns
+
+    meta=None
+    if os.path.exists(metaPath):
+        with open(metaPath) as f:
+            meta=json.load(f)
+    if meta is None or meta['source']!=source or meta.get('labelColumn')!=labelColumn:
+        table=pd.read_csv(path,header=None)
+        features=np.ascontiguousarray(table.drop(columns=table.columns[labelColumn]).to_numpy(dtype=np.float64))
+        classNames,labels=np.unique(table.iloc[:,labelColumn].to_numpy(),return_inverse=True)
+        os.makedirs(cacheDir,exist_ok=True)
+        np.save(featurePath,features)
+        np.save(labelPath,labels.astype(np.int64))
+        #the metadata is written last so a cache interrupted part way through is never mistaken for a valid one
+        with open(metaPath,'w') as f:
+            json.dump({'source':source,'labelColumn':labelColumn,'classNames':classNames.tolist()},f)
+        meta={'classNames':classNames.tolist()}
+
+    return np.load(featurePath,mmap_mode='r'),np.load(labelPath,mmap_mode='r'),np.array(meta['classNames'])
+
+class csvBatchStream:
+    #streams (X,Y) mini-batches of batchSize rows from a headerless csv of numbers that may be too big to load at once.
+    #The file is read chunkSize rows at a time with pandas.  If shuffle is True the rows pass through a buffer of shuffleBuffer rows
+    #and each batch is drawn at random from the buffer (the rows taken are replaced by rows from the end of the buffer), so memory is bounded by the
+    #buffer while rows are mixed across chunks.  The batches are produced by a background thread which stays up to prefetch batches ahead, so reading
+    #and parsing the next batch overlaps with training on the current one.
+    #labelColumns are the columns of Y (the rest are X).  Iterating over the stream again rereads the file, in a new order, for another epoch
+    def __init__(self,path,batchSize=32,labelColumns=(-1,),chunkSize=10000,shuffle=True,shuffleBuffer=10000,seed=None,prefetch=2,dtype=np.float64):
+        self.path=path
+        self.batchSize=batchSize
+        self.labelColumns=list(labelColumns)
+        self.chunkSize=chunkSize
+        self.shuffle=shuffle
+        self.shuffleBuffer=max(shuffleBuffer,batchSize)
+        self.rng=np.random.default_rng(seed)
+        self.prefetch=prefetch
+        self.dtype=dtype
+
+    def split(self,rows):
+        if not hasattr(self,'featureColumns'):
+            labels=[column%rows.shape[1] for column in self.labelColumns]
+            self.labelIndices=np.array(labels)
+            self.featureColumns=np.array([column for column in range(rows.shape[1]) if column not in labels])
+        return np.ascontiguousarray(rows[:,self.featureColumns]),np.ascontiguousarray(rows[:,self.labelIndices])
+
+    def batches(self):
+        #generator of batches in the calling thread (iterating over the stream runs this in the background thread instead)
+        buffer=None
+        count=0
+        for chunk in pd.read_csv(self.path,header=None,chunksize=self.chunkSize):
+            rows=chunk.to_numpy(dtype=self.dtype)
+            if not self.shuffle:
+                #a partial batch left at the end of a chunk is carried over to the front of the next chunk
+                if buffer is not None:
+                    rows=np.concatenate([buffer,rows])
+                end=len(rows)-len(rows)%self.batchSize
+                for start in range(0,end,self.batchSize):
+                    yield self.split(rows[start:start+self.batchSize])
+                buffer=rows[end:]
+                continue
+            if buffer is None:
+                buffer=np.empty((self.shuffleBuffer,rows.shape[1]),dtype=self.dtype)
+            position=0
+            while position<len(rows):
+                taken=min(self.shuffleBuffer-count,len(rows)-position)
+                buffer[count:count+taken]=rows[position:position+taken]
+                count+=taken
+                position+=taken
+                if count==self.shuffleBuffer:
+                    #draw one random batch and fill the holes it leaves with the rows from the end of the buffer that weren't drawn
+                    drawn=self.rng.choice(count,self.batchSize,replace=False)
+                    batch=buffer[drawn]
+                    end=count-self.batchSize
+                    buffer[drawn[drawn<end]]=buffer[np.setdiff1d(np.arange(end,count),drawn)]
+                    count=end
+                    yield self.split(batch)
+        #whatever is left once the file runs out
+        if self.shuffle:
+            remaining=buffer[self.rng.permutation(count)] if count>0 else None
+        else:
+            remaining=buffer
+        if remaining is not None:
+            for start in range(0,len(remaining),self.batchSize):
+                yield self.split(remaining[start:start+self.batchSize])
+
+    def __iter__(self):
+        batches=queue.Queue(maxsize=self.prefetch)
+        stop=threading.Event()
+        done=object()
+
+        def send(item):
+            #waits for room on the queue but gives up once the consumer has gone away, so the thread can always finish.  Returns whether item was sent
+            while not stop.is_set():
+                try:
+                    batches.put(item,timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            #puts batches on the queue until the file runs out or the consumer goes away.  An exception is passed through the queue to be raised by the consumer
+            try:
+                for batch in self.batches():
+                    if not send(batch):
+                        return
+                send(done)
+            except Exception as error:
+                send(error)
+
+        worker=threading.Thread(target=produce,daemon=True)
+        worker.start()
+        try:
+            while True:
+                batch=batches.get()
+                if batch is done:
+                    break
+                if isinstance(batch,Exception):
+                    raise batch
+                yield batch
+        finally:
+            stop.set()
+            worker.join()
+
+def squaredDistanceBlocks(testData,trainingData,blockBytes=2**24):
+    #yields the squared distances between a block of test points and every training point as one (rows x nTrain) matrix
+    #the difference is taken elementwise (rather than through |a|^2+|b|^2-2ab) so the values are bit for bit the same as the per-pair loop.
+    #The elementwise differences are a (rows x columns x nFeatures) temporary, which is kept within blockBytes so memory stays flat on large
+    #training sets: a block is as many test rows as fit against the whole training set, or a single row taken against the training set a chunk of columns at a time
+    testData=np.asarray(testData,dtype=float)
+    trainingData=np.asarray(trainingData,dtype=float)
+    nTrain,nFeatures=trainingData.shape
+    pairBytes=max(nFeatures*8,1)
+    rows=max(1,blockBytes//max(nTrain*pairBytes,1))
+    columns=max(1,min(nTrain,blockBytes//pairBytes))
+    for start in range(0,len(testData),rows):
+        block=testData[start:start+rows]
+        distances=np.empty((len(block),nTrain))
+        for column in range(0,nTrain,columns):
+            differences=block[:,np.newaxis,:]-trainingData[np.newaxis,column:column+columns,:]
+            np.square(differences,out=differences)
+            np.sum(differences,axis=2,out=distances[:,column:column+columns])
+        yield start,distances
+
+def topK(distances,k):
+    #returns the column indices of the k smallest entries of each row of distances, sorted nearest first with ties going to the lower index.
+    #np.argpartition finds each row's k-th smallest value in O(n), everything strictly below it is kept, and the remaining slots are
+    #filled by the lowest index entries equal to it.  Only the k survivors get sorted so a row costs O(n+k log k) rather than O(n log n)
+    nRows,n=distances.shape
+    if k>=n:
+        return np.argsort(distances,axis=1,kind='stable')
+    kth=np.take_along_axis(distances,np.argpartition(distances,k-1,axis=1)[:,k-1:k],axis=1)
+    below=distances<kth
+    equal=distances==kth
+    keep=below|(equal&(np.cumsum(equal,axis=1)<=k-np.sum(below,axis=1,keepdims=True)))
+    #np.nonzero walks the mask row by row so every row contributes exactly k indices in increasing order
+    chosen=np.nonzero(keep)[1].reshape(nRows,k)
+    order=np.argsort(np.take_along_axis(distances,chosen,axis=1),axis=1,kind='stable')
+    return np.take_along_axis(chosen,order,axis=1)
+
+def bruteForceNeighbors(testData,trainingData,k=1,blockBytes=2**24):
+    #returns the squared distances and indices of the k nearest training points for every test point, sorted nearest first.
+    #equal distances are ordered by training index (stable sort), which matches the strict '<' comparison in the original loop
+    nTest=len(testData)
+    k=min(k,len(trainingData))
+    distances=np.empty((nTest,k))
+    indices=np.empty((nTest,k),dtype=int)
+    for start,block in squaredDistanceBlocks(testData,trainingData,blockBytes):
+        order=topK(block,k)
+        indices[start:start+len(block)]=order
+        distances[start:start+len(block)]=np.take_along_axis(block,order,axis=1)
+    return distances,indices
+
+#training matrix each worker process attaches to in attachSharedTraining.  Kept at module level so it survives between tasks in a worker
+sharedTraining={}
+
+def attachSharedTraining(name,shape,dtype):
+    #pool initializer: map the parent's shared memory block as an array instead of pickling a copy of the training set to every worker
+    block=shared_memory.SharedMemory(name=name)
+    sharedTraining['block']=block
+    sharedTraining['data']=np.ndarray(shape,dtype=dtype,buffer=block.buf)
+
+def neighborWorker(task):
+    chunk,k,blockBytes=task
+    return bruteForceNeighbors(chunk,sharedTraining['data'],k=k,blockBytes=blockBytes)
 
-        trainingIndices=indices[:math.floor(len(indices)*trainingPercent)]
-        testIndices=indices[math.floor(len(indices)*trainingPercent):]
+def parallelNeighbors(testData,trainingData,k=1,nWorkers=None,chunkSize=1024,blockBytes=2**24):
+    #same result as bruteForceNeighbors but the test points are split into chunks of chunkSize which are searched by nWorkers processes
+    #(os.cpu_count() if None).  The training matrix is copied into shared memory once and every worker reads it from there.
+    #Pool.map returns chunk results in submission order, and each chunk is searched with the serial code, so the output is identical to the serial path
+    testData=np.asarray(testData,dtype=float)
+    trainingData=np.ascontiguousarray(trainingData,dtype=float)
+    block=shared_memory.SharedMemory(create=True,size=max(trainingData.nbytes,1))
+    try:
+        np.ndarray(trainingData.shape,dtype=trainingData.dtype,buffer=block.buf)[:]=trainingData
+        tasks=[(testData[start:start+chunkSize],k,blockBytes) for start in range(0,len(testData),chunkSize)]
+        with Pool(nWorkers,initializer=attachSharedTraining,initargs=(block.name,trainingData.shape,trainingData.dtype)) as pool:
+            results=pool.map(neighborWorker,tasks)
+    finally:
+        block.close()
+        block.unlink()
+    if len(results)==0:
+        k=min(k,len(trainingData))
+        return np.empty((0,k)),np.empty((0,k),dtype=int)
+    return np.concatenate([r[0] for r in results]),np.concatenate([r[1] for r in results])
 
-        trainingData=data[trainingIndices]
-        testData=data[testIndices]
-        testLabels=labels[testIndices]
-        trainingLabels=labels[trainingIndices] 
+class kdTree:
+    #a kd-tree built once from the training data and then queried for k nearest neighbors in roughly log(n) time per query on low dimensional data.
+    #each node is stored as [start,end,lower,upper,left,right] where start:end is the node's slice of self.order and lower/upper is its bounding box.
+    #leaves (left==-1) hold at most leafSize points which are checked by brute force
+    def __init__(self,data,leafSize=16):
+        self.data=np.ascontiguousarray(data,dtype=float)
+        self.leafSize=leafSize
+        self.order=np.arange(len(self.data))
+        self.nodes=[]
+        self.build(0,len(self.data))
+        #copy of the data in tree order so every leaf is a contiguous block
+        self.sortedData=self.data[self.order]
+
+    def build(self,start,end):
+        node=len(self.nodes)
+        points=self.data[self.order[start:end]]
+        lower=points.min(axis=0)
+        upper=points.max(axis=0)
+        self.nodes.append([start,end,lower,upper,-1,-1])
+        if end-start>self.leafSize:
+            #split the widest dimension at its median.  If every point is identical there is nothing to split so this stays a leaf
+            dim=np.argmax(upper-lower)
+            if upper[dim]>lower[dim]:
+                mid=(start+end)//2
+                part=np.argpartition(points[:,dim],mid-start)
+                self.order[start:end]=self.order[start:end][part]
+                self.nodes[node][4]=self.build(start,mid)
+                self.nodes[node][5]=self.build(mid,end)
+        return node
+
+    def boxDistance(self,node,point):
+        #squared distance from point to the closest corner/face of a node's bounding box (0 if the point is inside it)
+        lower=self.nodes[node][2]
+        upper=self.nodes[node][3]
+        return np.sum(np.square(np.maximum(np.maximum(lower-point,point-upper),0)))
+
+    def search(self,node,point,k,heap):
+        #heap holds the best k found so far as (-distance,-index) so heap[0] is the current worst neighbor.
+        #comparing (distance,index) pairs breaks ties toward the lower training index, the same as the brute force search
+        start,end,lower,upper,left,right=self.nodes[node]
+        if left==-1:
+            distances=np.sum(np.square(self.sortedData[start:end]-point),axis=1)
+            for distance,index in zip(distances.tolist(),self.order[start:end].tolist()):
+                if len(heap)<k:
+                    heapq.heappush(heap,(-distance,-index))
+                elif (distance,index)<(-heap[0][0],-heap[0][1]):
+                    heapq.heapreplace(heap,(-distance,-index))
+            return
+        #visit the closer child first so the far one is more likely to be pruned
+        children=sorted([(self.boxDistance(left,point),left),(self.boxDistance(right,point),right)])
+        for bound,child in children:
+            if len(heap)==k and bound>-heap[0][0]:
+                continue
+            self.search(child,point,k,heap)
+
+    def query(self,points,k=1):
+        #returns the squared distances and indices of the k nearest points for each query point, sorted nearest first
+        points=np.asarray(points,dtype=float)
+        k=min(k,len(self.data))
+        distances=np.empty((len(points),k))
+        indices=np.empty((len(points),k),dtype=int)
+        for i,point in enumerate(points):
+            heap=[]
+            self.search(0,point,k,heap)
+            best=sorted((-d,-j) for d,j in heap)
+            distances[i]=[d for d,j in best]
+            indices[i]=[j for d,j in best]
+        return distances,indices
+
+class lshIndex:
+    #approximate nearest neighbor index using random projection locality sensitive hashing.
+    #each of the nTables tables hashes a point to nBits bits, one per random hyperplane (through the mean of the data) recording which side the point is on.
+    #Points close together usually land in the same bucket, so a query only measures distances to the points sharing a bucket with it in some table.
+    #nProbes>1 also checks the buckets reached by flipping the bits the query is least sure about (closest to their hyperplane).
+    #More tables/probes means higher recall but more candidates to check.  Fewer bits means bigger buckets with the same effect
+    def __init__(self,data,nTables=8,nBits=8,nProbes=1,seed=None):
+        self.data=np.ascontiguousarray(data,dtype=float)
+        self.nTables=nTables
+        self.nBits=nBits
+        self.nProbes=nProbes
+        rng=np.random.default_rng(seed)
+        self.center=self.data.mean(axis=0)
+        self.planes=rng.standard_normal((nTables,self.data.shape[1],nBits))
+        self.powers=1<<np.arange(nBits)
+        #each table is stored as the bucket codes of the data sorted, plus the order that sorts them, so a bucket is found with searchsorted
+        self.sortedCodes=[]
+        self.orders=[]
+        for projection in self.project(self.data):
+            codes=np.dot(projection>0,self.powers)
+            order=np.argsort(codes,kind='stable')
+            self.orders.append(order)
+            self.sortedCodes.append(codes[order])
+
+    def project(self,points):
+        #(nTables x nPoints x nBits) signed distances of points from every hyperplane
+        return np.einsum('nd,tdb->tnb',points-self.center,self.planes)
+
+    def candidates(self,projections):
+        #indices of every data point sharing a probed bucket with one query, given that query's (nTables x nBits) projections
+        found=[]
+        for t in range(self.nTables):
+            code=int(np.dot(projections[t]>0,self.powers))
+            probes=[code]
+            for bit in np.argsort(np.abs(projections[t]))[:self.nProbes-1]:
+                probes.append(code^int(self.powers[bit]))
+            for probe in probes:
+                left=np.searchsorted(self.sortedCodes[t],probe,side='left')
+                right=np.searchsorted(self.sortedCodes[t],probe,side='right')
+                found.append(self.orders[t][left:right])
+        return np.unique(np.concatenate(found))
+
+    def query(self,points,k=1):
+        #same output format as kdTree.query.  Candidates are measured exactly and the k best kept (ties to the lower index).
+        #If a query's buckets hold fewer than k points it falls back to scanning the whole data set so every neighbor list is full length
+        points=np.asarray(points,dtype=float)
+        k=min(k,len(self.data))
+        distances=np.empty((len(points),k))
+        indices=np.empty((len(points),k),dtype=int)
+        for i,projections in enumerate(np.swapaxes(self.project(points),0,1)):
+            candidates=self.candidates(projections)
+            if len(candidates)<k:
+                candidates=np.arange(len(self.data))
+            candidateDistances=np.sum(np.square(self.data[candidates]-points[i]),axis=1)[np.newaxis,:]
+            best=topK(candidateDistances,k)[0]
+            indices[i]=candidates[best]
+            distances[i]=candidateDistances[0,best]
+        return distances,indices
+
+    def recall(self,points,k=1):
+        #measured recall of this index against an exact search on the same points
+        return neighborRecall(self.query(points,k)[1],bruteForceNeighbors(points,self.data,k=k)[1])
+
+def neighborRecall(approxIndices,exactIndices):
+    #fraction of the true k nearest neighbors that an approximate search found, averaged over queries
+    found=[len(np.intersect1d(a,e))/len(e) for a,e in zip(approxIndices,exactIndices)]
+    return np.mean(found)
+
+def electWinner(neighborLabels,neighborDistances):
+    #the prediction label is whichever label was associated with a plurality of k nearest neighbors
+    #here I determine the winner through an 'election' where each of the k nearest neighbors 'votes' for their associated label
+    #neighborLabels[x] is the label of a neighbor and neighborDistances[x] is its distance to the point being classified
+    candidates=[]
+    tieBreakerInfo={}
+    votes=np.array([])
+
+    #loop through the k nearest neighbors
+    for x,candidate in enumerate(neighborLabels):
+        #this first if is redundant with the following elif, but numpy throws a warning if you attempt to check if a string is in an empty array and I'd like to avoid this
+        if x==0:
+            #we keep track of each candidates minimum distance voter for tiebreakers later
+            tieBreakerInfo[candidate]=neighborDistances[x]
+            #keep track of what candidates are on the board
+            candidates.append(candidate)
+            #count a vote
+            votes=np.append(votes,1)
+        #votes are associated with candidates through index in the two arrays.  candidate i from the candidates array has votes equal to the ith element of the votes array
+
+        #if this candidate hasn't isn't on the board yet (could include the above case)
+        elif candidate not in candidates:
+            tieBreakerInfo[candidate]=neighborDistances[x]
+            candidates.append(candidate)
+            votes=np.append(votes,1)
+        else:
+            #if this candidate is on the board we add one to its vote
+            votes[candidates.index(candidate)]+=1
+            #check to see if this voter has a lower minimum distance than previous voters.  If so, replace the mimimum distance vote associated with this candidate
+            if tieBreakerInfo[candidate]>neighborDistances[x]:
+                tieBreakerInfo[candidate]=neighborDistances[x]
+            else:
+                pass
+    #if there is not a tie the candidate with the most votes wins
+    if len(np.where(votes==max(votes))[0])==1:
+        winner=candidates[np.where(votes==max(votes))[0][0]]
+
+    #Ties go to the candidate with the lowest minimum distance voter recorded in tieBreakerInfo
     else:
-        pass
+        ties=[]
+        #collect the candidates that had the highest number of votes
+        for loc in np.where(votes==max(votes))[0]:
+            ties.append(candidates[loc])
+        #go through these second phase candidates and see who has the lowest minimum distance voter
+        for count,tie in enumerate(ties):
+            if count==0:
+                minTieDistance=tieBreakerInfo[tie]
+                winner=tie
+            elif minTieDistance<tieBreakerInfo[tie]:
+                minTieDistance=tieBreakerInfo[tie]
+                winner=tie
+            else:
+                pass
+    return winner
 
-    nearestNeighbors=np.array([])
-    right=0
-    wrong=0
+class kNeighborsClassifier:
+    #a k nearest neighbor classifier that seperates fitting (storing the training set) from predicting so repeated predictions against
+    #the same training set only pay for the query work.  Ties in the vote are settled by electWinner, same as kNearestNeighbors.
+    #algorithm='brute' scans the training set a block of queries at a time, algorithm='kdtree' searches a kdTree built in fit
+    #and algorithm='lsh' searches an approximate lshIndex built in fit with nTables, nBits, nProbes and seed
+    def __init__(self,k=1,algorithm='brute',blockSize=256,leafSize=16,nTables=8,nBits=8,nProbes=1,seed=None):
+        self.k=k
+        self.algorithm=algorithm
+        self.blockSize=blockSize
+        self.leafSize=leafSize
+        self.nTables=nTables
+        self.nBits=nBits
+        self.nProbes=nProbes
+        self.seed=seed
 
-    #calculate nearest neighbors for each element of training set
+    def fit(self,X,y):
+        #keep a contiguous float copy of the training set and its squared norms so they are computed once rather than per query
+        self.trainingData=np.ascontiguousarray(X,dtype=float)
+        self.trainingLabels=np.asarray(y)
+        self.squaredNorms=np.einsum('ij,ij->i',self.trainingData,self.trainingData)
+        if self.algorithm=='kdtree':
+            self.tree=kdTree(self.trainingData,leafSize=self.leafSize)
+        elif self.algorithm=='lsh':
+            self.tree=lshIndex(self.trainingData,nTables=self.nTables,nBits=self.nBits,nProbes=self.nProbes,seed=self.seed)
+        elif self.algorithm!='brute':
+            raise ValueError('unknown algorithm {}'.format(self.algorithm))
+        return self
+
+    def kneighbors(self,Xq,k=None):
+        #returns the squared distances and training indices of the k nearest neighbors of each query, sorted nearest first
+        if k is None:
+            k=self.k
+        Xq=np.ascontiguousarray(Xq,dtype=float)
+        if self.algorithm!='brute':
+            return self.tree.query(Xq,k=k)
+        k=min(k,len(self.trainingData))
+        distances=np.empty((len(Xq),k))
+        indices=np.empty((len(Xq),k),dtype=int)
+        for start in range(0,len(Xq),self.blockSize):
+            block=Xq[start:start+self.blockSize]
+            #|q-t|^2=|q|^2+|t|^2-2q.t so a whole block is one matrix product.  That is only used to find the neighbors though: its rounding would
+            #change the distances electWinner compares, and could swap which of two equally distant points makes the k.
+            queryNorms=np.einsum('ij,ij->i',block,block)
+            blockDistances=queryNorms[:,np.newaxis]+self.squaredNorms[np.newaxis,:]-2*np.dot(block,self.trainingData.T)
+            #every point within the rounding error of the k-th nearest is a candidate, which is a few more than k at most except with many exact ties
+            tolerance=8*(block.shape[1]+2)*np.finfo(float).eps*(queryNorms+np.max(self.squaredNorms))
+            kth=np.take_along_axis(blockDistances,topK(blockDistances,k)[:,k-1:k],axis=1)
+            nCandidates=int(np.max(np.sum(blockDistances<=kth+tolerance[:,np.newaxis],axis=1)))
+            candidates=np.sort(topK(blockDistances,nCandidates),axis=1)
+            #the candidates' distances are recomputed exactly, the same way as the per-pair loop, and sorted by distance then training index
+            exact=np.sum(np.square(block[:,np.newaxis,:]-self.trainingData[candidates]),axis=2)
+            order=np.argsort(exact,axis=1,kind='stable')[:,:k]
+            indices[start:start+len(block)]=np.take_along_axis(candidates,order,axis=1)
+            distances[start:start+len(block)]=np.take_along_axis(exact,order,axis=1)
+        return distances,indices
+
+    def predict(self,Xq):
+        distances,indices=self.kneighbors(Xq)
+        neighborLabels=self.trainingLabels[indices]
+        return np.array([electWinner(neighborLabels[i],distances[i]) for i in range(len(indices))])
+
+    def score(self,Xq,yq):
+        #percent of queries classified correctly, same scale as the percentCorrect returned by kNearestNeighbors
+        return np.mean(self.predict(Xq)==np.asarray(yq))*100
+
+def splitData(data,labels,trainingPercent=0.75):
+    #randomly assign data to test or training
+    indices=np.arange(0,len(data))
+    np.random.shuffle(indices)
+
+    trainingIndices=indices[:math.floor(len(indices)*trainingPercent)]
+    testIndices=indices[math.floor(len(indices)*trainingPercent):]
+
+    return data[trainingIndices],data[testIndices],labels[trainingIndices],labels[testIndices]
+
+def loopNeighbors(testData,trainingData,k=1):
+    #the original pure python double loop, kept as a reference for the other engines
+    k=min(k,len(trainingData))
+    distances=np.empty((len(testData),k))
+    indices=np.empty((len(testData),k),dtype=int)
     for i,test in enumerate(testData):
-        mins=np.array([])
-        indices=np.array([])
+        #keep the best k candidates in a heap of (-distance,-index) so heap[0] is the worst one kept and each replacement is O(log k).
+        #comparing (distance,index) pairs breaks ties toward the lower training index, the same as the other engines
+        heap=[]
         for j,train in enumerate(trainingData):
             distance=np.sum(np.square(test-train))
             if j<k:
-                mins=np.append(mins,distance)
-                indices=np.append(indices,j)
-            elif distance<max(mins):
-                #remove the largest element of mins from mins and indices and replace with new distance&index
-                mins=np.delete(mins,np.where(mins==max(mins))[0][0])
-                mins=np.append(mins,distance)
-                indices=np.delete(indices,np.where(mins==max(mins))[0][0])
-                indices=np.append(indices,j)
+                heapq.heappush(heap,(-distance,-j))
+            elif (distance,j)<(-heap[0][0],-heap[0][1]):
+                heapq.heapreplace(heap,(-distance,-j))
             else:
                 pass
-        
-        candidates=[]
-        tieBreakerInfo={}
-        votes=np.array([])
-
-        #the prediction label is whichever label was associated with a plurality of k nearest neighbors
-        #here I determine the winner through an 'election' where each of the k nearest neighbors 'votes' for their associated label
-        
-        #loop through the indices of the k nearest neighbors
-        for x,index in enumerate(indices):
-            index=int(index)
-            #the candidate this neighbor votes for is the label associated with the same index
-            candidate=trainingLabels[index]
-            #this first if is redundant with the following elif, but numpy throws a warning if you attempt to check if a string is in an empty array and I'd like to avoid this
-            if x==0:
-                #we keep track of each candidates minimum distance voter for tiebreakers later
-                tieBreakerInfo[candidate]=mins[x]
-                #keep track of what candidates are on the board
-                candidates.append(candidate)
-                #count a vote
-                votes=np.append(votes,1)
-            #votes are associated with candidates through index in the two arrays.  candidate i from the candidates array has votes equal to the ith element of the votes array
-
-            #if this candidate hasn't isn't on the board yet (could include the above case)
-            elif candidate not in candidates:
-                tieBreakerInfo[candidate]=mins[x]
-                candidates.append(candidate)
-                votes=np.append(votes,1)
-            else:
-                #if this candidate is on the board we add one to its vote
-                votes[candidates.index(candidate)]+=1
-                #check to see if this voter has a lower minimum distance than previous voters.  If so, replace the mimimum distance vote associated with this candidate
-                if tieBreakerInfo[candidate]>mins[x]:
-                    tieBreakerInfo[candidate]=mins[x]
-                else:
-                    pass
-        #if there is not a tie we record the prediciton and move on
-        if len(np.where(votes==max(votes))[0])==1:
-            winner=candidates[np.where(votes==max(votes))[0][0]]
-            nearestNeighbors=np.append(nearestNeighbors,winner)
+        best=sorted((-d,-j) for d,j in heap)
+        distances[i]=[d for d,j in best]
+        indices[i]=[j for d,j in best]
+    return distances,indices
 
-        #Ties go to the candidate with the lowest minimum distance voter recorded in tieBreakerInfo
-        else:
-            ties=np.array([])
-            #collect the candidates that had the highest number of votes
-            for loc in np.where(votes==max(votes))[0]:
-                ties=np.append(ties,candidates[loc])
-            #go through these second phase candidates and see who has the lowest minimum distance voter
-            for count,tie in enumerate(ties):
-                if count==0:
-                    minTieDistance=tieBreakerInfo[tie]
-                    winner=tie
-                elif minTieDistance<tieBreakerInfo[tie]:
-                    minTieDistance=tieBreakerInfo[tie]
-                    winner=tie
-                else:
-                    pass
+def findNeighbors(testData,trainingData,k=1,engine='vectorized',blockBytes=2**24,leafSize=16,nWorkers=None,chunkSize=1024,nTables=8,nBits=8,nProbes=1,seed=None):
+    #returns the squared distances and indices of the k nearest training points to every test point, sorted nearest first
+    #engine='vectorized' computes distances a block of test points at a time with numpy (see bruteForceNeighbors)
+    #engine='kdtree' builds a kdTree from the training data and searches it instead of scanning every training point
+    #engine='parallel' is the vectorized search spread over nWorkers processes (see parallelNeighbors)
+    #engine='lsh' is an approximate search through an lshIndex built with nTables, nBits, nProbes and seed
+    #engine='loop' is the original pure python double loop, kept as a reference
+    if engine=='vectorized':
+        return bruteForceNeighbors(testData,trainingData,k=k,blockBytes=blockBytes)
+    elif engine=='kdtree':
+        return kdTree(trainingData,leafSize=leafSize).query(testData,k=k)
+    elif engine=='lsh':
+        return lshIndex(trainingData,nTables=nTables,nBits=nBits,nProbes=nProbes,seed=seed).query(testData,k=k)
+    elif engine=='parallel':
+        return parallelNeighbors(testData,trainingData,k=k,nWorkers=nWorkers,chunkSize=chunkSize,blockBytes=blockBytes)
+    elif engine=='loop':
+        return loopNeighbors(testData,trainingData,k=k)
+    raise ValueError('unknown engine {}'.format(engine))
+
+def kNearestNeighbors(data, labels, testData=None, trainingData=None,trainingLabels=None,testLabels=None, mode='mixed',labelled=True,trainingPercent=0.75,k=1,engine='vectorized',blockBytes=2**24,leafSize=16,nWorkers=None,chunkSize=1024,nTables=8,nBits=8,nProbes=1,seed=None):
+    #see findNeighbors for the engine options
+    if mode=='mixed':
+        trainingData,testData,trainingLabels,testLabels=splitData(data,labels,trainingPercent)
+    else:
+        pass
+
+    nearestNeighbors=np.array([])
+    right=0
+    wrong=0
+
+    neighborDistances,neighborIndices=findNeighbors(testData,trainingData,k=k,engine=engine,blockBytes=blockBytes,leafSize=leafSize,
+                                                    nWorkers=nWorkers,chunkSize=chunkSize,nTables=nTables,nBits=nBits,nProbes=nProbes,seed=seed)
 
+    #calculate nearest neighbors for each element of training set
+    for i in range(len(testData)):
         #the winner of the election is our prediction label which we record
+        winner=electWinner(trainingLabels[neighborIndices[i]],neighborDistances[i])
         nearestNeighbors=np.append(nearestNeighbors,winner)
 
         #check to see if nearest neighbor was of the same type as test data
@@ -179,8 +1119,70 @@ def kNearestNeighbors(data, labels, testData=None, trainingData=None,trainingLab
             wrong+=1
 
     #calculate success rate
-    tot=len(testIndices)
+    tot=len(testData)
     percentCorrect=right/tot*100
 
     return nearestNeighbors,percentCorrect
 
+def multiKNearestNeighbors(data, labels, ks, testData=None, trainingData=None,trainingLabels=None,testLabels=None, mode='mixed',trainingPercent=0.75,**engineOptions):
+    #scores every k in ks against one split with a single search.  The max(ks) nearest neighbors come back sorted, so the first k of them
+    #are exactly the k nearest and each k only costs an election.  engineOptions are passed on to findNeighbors.
+    #returns a (len(ks) x nTest) array of predictions and the percentCorrect for each k
+    if mode=='mixed':
+        trainingData,testData,trainingLabels,testLabels=splitData(data,labels,trainingPercent)
+
+    neighborDistances,neighborIndices=findNeighbors(testData,trainingData,k=max(ks),**engineOptions)
+    neighborLabels=trainingLabels[neighborIndices]
+
+    predictions=np.empty((len(ks),len(testData)),dtype=np.asarray(trainingLabels).dtype)
+    percentCorrect=np.empty(len(ks))
+    for n,k in enumerate(ks):
+        for i in range(len(testData)):
+            predictions[n,i]=electWinner(neighborLabels[i,:k],neighborDistances[i,:k])
+        percentCorrect[n]=np.mean(predictions[n]==np.asarray(testLabels))*100
+    return predictions,percentCorrect
+
+class distanceCache:
+    #pairwise squared distance matrix of a whole data set, computed once so repeated random train/test splits only have to index into it.
+    #The rows are filled a block at a time with squaredDistanceBlocks so the values are identical to a fresh search.
+    #If path is given the matrix is written to a memory-mapped .npy file there instead of being held in memory, for data sets too big for RAM.
+    #blockBytes bounds the temporary used while building it (see squaredDistanceBlocks) and blockSize is the number of test rows neighbors reads at once
+    def __init__(self,data,path=None,blockSize=256,blockBytes=2**24):
+        data=np.asarray(data,dtype=float)
+        if path is None:
+            self.distances=np.empty((len(data),len(data)))
+        else:
+            self.distances=np.lib.format.open_memmap(path,mode='w+',dtype=float,shape=(len(data),len(data)))
+        for start,block in squaredDistanceBlocks(data,data,blockBytes):
+            self.distances[start:start+len(block)]=block
+        if path is not None:
+            self.distances.flush()
+        self.blockSize=blockSize
+
+    def split(self,rng,trainingPercent=0.75):
+        #draws a random split from a numpy Generator (np.random.default_rng(seed)) so a run can be reproduced from its seed
+        indices=rng.permutation(len(self.distances))
+        cut=math.floor(len(indices)*trainingPercent)
+        return indices[:cut],indices[cut:]
+
+    def neighbors(self,testIndices,trainingIndices,k=1):
+        #same output as bruteForceNeighbors(data[testIndices],data[trainingIndices],k) but read from the cache
+        k=min(k,len(trainingIndices))
+        distances=np.empty((len(testIndices),k))
+        indices=np.empty((len(testIndices),k),dtype=int)
+        for start in range(0,len(testIndices),self.blockSize):
+            block=self.distances[np.ix_(testIndices[start:start+self.blockSize],trainingIndices)]
+            order=topK(block,k)
+            indices[start:start+len(block)]=order
+            distances[start:start+len(block)]=np.take_along_axis(block,order,axis=1)
+        return distances,indices
+
+def cachedKNearestNeighbors(cache,labels,rng,trainingPercent=0.75,k=1):
+    #kNearestNeighbors in 'mixed' mode, but the split is drawn from rng and the distances come from a distanceCache of the data
+    labels=np.asarray(labels)
+    trainingIndices,testIndices=cache.split(rng,trainingPercent)
+    neighborDistances,neighborIndices=cache.neighbors(testIndices,trainingIndices,k=k)
+    trainingLabels=labels[trainingIndices]
+    nearestNeighbors=np.array([electWinner(trainingLabels[neighborIndices[i]],neighborDistances[i]) for i in range(len(testIndices))])
+    percentCorrect=np.mean(nearestNeighbors==labels[testIndices])*100
+    return nearestNeighbors,percentCorrect
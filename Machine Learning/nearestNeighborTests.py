@@ -1,7 +1,6 @@
-import pandas as pd 
 import numpy as np
 import math
-from mLFuncs import kNearestNeighbors 
+from mLFuncs import multiKNearestNeighbors, lshIndex, distanceCache, cachedKNearestNeighbors, loadDataset
 from sklearn.datasets import load_iris 
 from sklearn.neighbors import KNeighborsClassifier 
 from sklearn.model_selection import train_test_split 
@@ -22,26 +21,22 @@ trials=100
 #timing experiment:
 #run my kNearestNeighbors function and that from sklearn 100 times to produce an average time per run to establish which is more efficient
 print('performing time comparison... \n')
-time1=timeit("""from mLFuncs import kNearestNeighbors
-import pandas as pd
-data=pd.read_csv('iris.data').to_numpy()
-stripped=data[:,:4]
-flowers=data[:,-1]
-results=kNearestNeighbors(stripped,flowers,k=1)""",number=trials)
-
-time2=timeit("""from sklearn.datasets import load_iris 
-from sklearn.neighbors import KNeighborsClassifier 
-from sklearn.model_selection import train_test_split
+#imports and loading the data set go in setup so only the algorithms themselves are timed.  knnBenchmark.py has a more thorough benchmark
+time1=timeit("""results=kNearestNeighbors(stripped,flowers,k=1)""",setup="""from mLFuncs import kNearestNeighbors, loadDataset
+stripped,flowers,flowerNames=loadDataset('iris.data')""",number=trials)
 
-iris_dataset=load_iris()
-X_train, X_test, y_train, y_test = train_test_split(iris_dataset['data'], iris_dataset['target'], shuffle=True)
+time2=timeit("""X_train, X_test, y_train, y_test = train_test_split(iris_dataset['data'], iris_dataset['target'], shuffle=True)
 
 knn = KNeighborsClassifier(n_neighbors=1)
 
 knn.fit(X_train, y_train)
 
 y_pred = knn.predict(X_test)
-""",number=trials)
+""",setup="""from sklearn.datasets import load_iris 
+from sklearn.neighbors import KNeighborsClassifier 
+from sklearn.model_selection import train_test_split
+
+iris_dataset=load_iris()""",number=trials)
 
 print('\nMy nearest neighbor function average runtime: {:.4f} seconds'.format(time1/trials))
 print('sklearn nearest neighbor average runtime: {:.4f} seconds'.format(time2/trials))
@@ -50,9 +45,7 @@ print('My nearest neighbor was {:.2f} times slower than the sklearn implementati
 #while I assume the sklearn implementation is highly optimized.
 input('\npres ret to continue ')
 
-data=pd.read_csv('iris.data').to_numpy()
-stripped=data[:,:4]
-flowers=data[:,-1]
+stripped,flowers,flowerNames=loadDataset('iris.data')
 
 #Accuracy vs training data size experiment:
 #Here I'll test how informationally efficient each KNN algorithm is by ramping down the ammount of the dataset reserved for training data.
@@ -62,11 +55,15 @@ iris_dataset=load_iris()
 testRatio=np.arange(25,100)/100
 myAccuracies=np.array([])
 sklearnAccuracies=np.array([])
+#every split is drawn from the same 150 irises so the distances between them are computed once up front and each split just indexes into them.
+#splits come from a seeded generator so a run can be reproduced
+cache=distanceCache(iris_dataset['data'])
+rng=np.random.default_rng(0)
 #loop over data ratios and record accuracy of both KNN methods.  10 trials for each ratio as accuracy fluctuates slightly.
 print('plotting accuracy vs training dataset size... \n')
 for i in range(10):
     for item in testRatio:
-        results=kNearestNeighbors(iris_dataset['data'],iris_dataset['target'],k=1,trainingPercent=1-item)
+        results=cachedKNearestNeighbors(cache,iris_dataset['target'],rng,k=1,trainingPercent=1-item)
         myAccuracies=np.append(myAccuracies,results[1])
 
         testSize=math.floor(item*len(iris_dataset['data']))
@@ -100,13 +97,20 @@ ax.legend()
 plt.show()
 print('\nplotting accuracy vs K value...\n')
 myAccuracies=np.array([]) 
+approxAccuracies=np.array([])
 sklearnAccuracies=np.array([]) 
 ks=np.arange(1,11)
+#the approximate (lsh) search only checks points that hash into the same buckets as the query.  The iris set is tiny so a few bits per table is plenty
+lshSettings={'nTables':8,'nBits':3,'nProbes':1}
 for i in range(10):
-    for k in ks:
-        results=kNearestNeighbors(iris_dataset['data'],iris_dataset['target'],k=k)
-        myAccuracies=np.append(myAccuracies,results[1])
+    #one neighbor search per trial scores every k at once (the 10 nearest neighbors also hold the 1-9 nearest)
+    results=multiKNearestNeighbors(iris_dataset['data'],iris_dataset['target'],ks)
+    myAccuracies=np.append(myAccuracies,results[1])
 
+    results=multiKNearestNeighbors(iris_dataset['data'],iris_dataset['target'],ks,engine='lsh',**lshSettings)
+    approxAccuracies=np.append(approxAccuracies,results[1])
+
+    for k in ks:
         X_train, X_test, y_train, y_test = train_test_split(iris_dataset['data'], iris_dataset['target'], shuffle=True)
         knn = KNeighborsClassifier(n_neighbors=k)
         knn.fit(X_train, y_train)
@@ -119,15 +123,24 @@ myAccuracies=myAccuracies.reshape(10,len(ks))
 myAccuracies=myAccuracies.T
 myAccuracies=np.mean(myAccuracies,axis=1)
 
+approxAccuracies=approxAccuracies.reshape(10,len(ks))
+approxAccuracies=approxAccuracies.T
+approxAccuracies=np.mean(approxAccuracies,axis=1)
+
 sklearnAccuracies=sklearnAccuracies.reshape(10,len(ks))
 sklearnAccuracies=sklearnAccuracies.T
 sklearnAccuracies=np.mean(sklearnAccuracies,axis=1)*100
 
+#how many of the true k nearest neighbors the approximate search actually finds
+X_train, X_test, y_train, y_test = train_test_split(iris_dataset['data'], iris_dataset['target'], shuffle=True)
+print('approximate KNN recall at k=10: {:.2f}'.format(lshIndex(X_train,**lshSettings).recall(X_test,k=10)))
+
 fig,ax=plt.subplots(1) 
 ax.set_title('accuracy vs k value')
 ax.set_ylabel('% Accuracy of KNN averaged over 10 trials')
 ax.set_xlabel('k value')
 ax.plot(ks,myAccuracies,label='My KNN')
+ax.plot(ks,approxAccuracies,label='My approximate KNN')
 ax.plot(ks,sklearnAccuracies,label='sklearn KNN')
 ax.legend()
 plt.show()
@@ -0,0 +1,104 @@
+import numpy as np
+import json
+import time
+import platform
+import argparse
+from mLFuncs import neuralNetwork, sigmoid
+
+"""About this task:
+Compares training the neural network in float64 (the default) and float32.  float32 halves the size of every weight, activation and gradient
+so for bigger networks, where moving data through memory is the bottleneck, it should train faster.  The question is whether we lose accuracy.
+
+Each task is trained from the same starting weights in both dtypes with neuralNetwork.trainBatch for a fixed number of epochs (no early stopping
+so both do the same work).  Training is timed over a few repeats from fresh copies of the starting weights and the fastest is kept.
+Accuracy is judged the same way as testNet: an output counts as right if it's within half of sigmoid(1)-sigmoid(0) of the sigmoid of the label,
+ie. it would round to the right answer.  The tasks are:
+-the AND, OR and XOR truth tables from neuralNetwork.py
+-a larger synthetic task: random inputs labelled by thresholding the outputs of a random 'teacher' network
+
+Results are printed and written as json.  Run with -h for the options.
+"""
+
+def truthTable(gate):
+    X=np.array([[0,0],[1,0],[0,1],[1,1]])
+    Y=np.array([[gate(a,b)] for a,b in X])
+    return X,Y
+
+def syntheticTask(nSamples,nInputs,nOutputs,seed):
+    #labels are 0/1 from a random teacher network so the task is learnable.  The teacher's outputs are centered first so both labels show up
+    rng=np.random.default_rng(seed)
+    X=rng.random((nSamples,nInputs))
+    teacher=rng.standard_normal((nInputs,nOutputs))
+    scores=np.dot(X-0.5,teacher)
+    return X,(scores>0).astype(float)
+
+def tasks(args):
+    #(name, X, Y, network settings, training settings).  'centered' is not a neuralNetwork setting, see runTask
+    small={'nLayers':1,'nNodes':4}
+    smallTraining={'batchSize':4,'nEpochs':args.tableEpochs,'learningRate':5}
+    X,Y=syntheticTask(args.nSamples,args.nInputs,args.nOutputs,args.seed)
+    return [
+        ('AND',)+truthTable(lambda a,b:a&b)+(small,smallTraining),
+        ('OR',)+truthTable(lambda a,b:a|b)+(small,smallTraining),
+        ('XOR',)+truthTable(lambda a,b:a^b)+(small,smallTraining),
+        ('synthetic',X,Y,{'nLayers':args.nLayers,'nNodes':args.nNodes,'centered':True},{'batchSize':args.batchSize,'nEpochs':args.epochs,'learningRate':20}),
+    ]
+
+def accuracy(net,X,Y):
+    tolerance=(sigmoid(1)-sigmoid(0))/2
+    return float(np.mean(np.abs(net.predict(X)-sigmoid(Y))<tolerance))
+
+def runTask(name,X,Y,netSettings,trainSettings,dtype,repeats,seed):
+    netSettings=dict(netSettings)
+    centered=netSettings.pop('centered',False)
+    best=np.inf
+    for i in range(repeats):
+        #same starting weights for every repeat and both dtypes
+        np.random.seed(seed)
+        net=neuralNetwork(X[0],Y[0],dtype=dtype,**netSettings)
+        if centered:
+            #neuralNetwork's weights start uniform on [0,1) so every weighted sum in a wide layer is large and positive and the sigmoids start saturated
+            #(no gradient to learn from).  For the wide synthetic network the starting weights are shifted to [-0.5,0.5) and scaled by 1/sqrt(inputs to the layer)
+            for weight in net.weights:
+                weight-=0.5
+                weight*=2/np.sqrt(weight.shape[1])
+        start=time.perf_counter()
+        lossCurve=net.trainBatch(X,Y,seed=seed,**trainSettings)
+        best=min(best,time.perf_counter()-start)
+    samples=len(X)*len(lossCurve)
+    return net,{'task':name,'dtype':np.dtype(dtype).name,'nSamples':len(X),'epochs':len(lossCurve),'seconds':best,
+                'samplesPerSecond':samples/best,'finalLoss':float(lossCurve[-1]),'accuracy':accuracy(net,X,Y),
+                'weightBytes':int(sum(weight.nbytes for weight in net.weights))}
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Compare float32 and float64 training of mLFuncs.neuralNetwork')
+    parser.add_argument('--nSamples',type=int,default=20000)
+    parser.add_argument('--nInputs',type=int,default=64)
+    parser.add_argument('--nOutputs',type=int,default=8)
+    parser.add_argument('--nLayers',type=int,default=2)
+    parser.add_argument('--nNodes',type=int,default=256)
+    parser.add_argument('--batchSize',type=int,default=256)
+    parser.add_argument('--epochs',type=int,default=10)
+    parser.add_argument('--tableEpochs',type=int,default=2000)
+    parser.add_argument('--repeats',type=int,default=3)
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--output',default='netBenchmarkResults.json')
+    args=parser.parse_args()
+
+    records=[]
+    for name,X,Y,netSettings,trainSettings in tasks(args):
+        nets={}
+        for dtype in [np.float64,np.float32]:
+            nets[dtype],record=runTask(name,X,Y,netSettings,trainSettings,dtype,args.repeats,args.seed)
+            records.append(record)
+            print('{:>9} {:>7}: {:>12.0f} samples/s  loss={:.5f}  accuracy={:.3f}'.format(name,record['dtype'],record['samplesPerSecond'],record['finalLoss'],record['accuracy']))
+        #how far apart the two dtypes' trained networks end up
+        difference=np.max(np.abs(nets[np.float64].predict(X)-nets[np.float32].predict(X)))
+        records[-1]['maxOutputDifference']=float(difference)
+        print('{:>9} float32 speedup {:.2f}x, largest output difference {:.2e}'.format(name,records[-1]['samplesPerSecond']/records[-2]['samplesPerSecond'],difference))
+
+    results={'python':platform.python_version(),'numpy':np.__version__,'machine':platform.machine(),
+             'time':time.strftime('%Y-%m-%dT%H:%M:%S'),'settings':vars(args),'results':records}
+    with open(args.output,'w') as f:
+        json.dump(results,f,indent=1)
+    print('\nresults written to {}'.format(args.output))
@@ -23,11 +23,13 @@ was the majority of the work that went into this project, so check the directory
 # functions and their derivatives for use in neural net
 # using sigmoid for activation function and sum of squared errors for cost function
 
+#sigmoid is written as e^-log(1+e^-x) (np.logaddexp(0,-x) is log(1+e^-x) without overflowing) so large negative inputs don't overflow
 def sigmoid(x):
-    return 1/(1+np.power(np.e,-x))
+    return np.exp(-np.logaddexp(0,-x))
 
 def dSigmoid(x):
-    return ((np.power(np.e,-x))/(np.power(1+np.power(np.e,-x),2)))
+    s=sigmoid(x)
+    return s*(1-s)
 
 def inverseSigmoid(x):
     return np.log(x/(1-x))
@@ -70,14 +72,22 @@ class neuralNetwork:
                 self.layers.append(np.dot(weight,self.activations[-1]))
                 self.activations.append(activationFunction(self.layers[-1]))
 
-    def backProp(self,dActivationFunction,dCostFunction,activationFunction):
+    def backProp(self,dActivationFunction=None,dCostFunction=dSumSquaredErrors,activationFunction=sigmoid):
         #Perform backPropagation by calculating derivative of each weight with respect to the cost function
+        #With dActivationFunction=None the sigmoid's derivative s(1-s) is taken from the activations feedForward stored, so no exponential is recomputed.
+        #Passing a derivative function of the layer values (eg. dSigmoid) overrides this
+        def derivative(j):
+            #derivative of the activation function at layers[j].  activations has the input in front so activations[j] (j counting from the end) is the activation of layers[j]
+            if dActivationFunction is None:
+                s=self.activations[j]
+                return s*(1-s)
+            return dActivationFunction(self.layers[j])
         self.dWeightsReversed=[]
         self.dAdCostReversed=[]
         #the first (technically last) weight derivative matrix is calculated seperately as the backpropagation process is iterative so we need a starting point.
         dAdCost=dCostFunction(activationFunction(self.y),self.activations[-1])
         self.dAdCostReversed.append(dAdCost)
-        dLdC=dAdCost*dSigmoid(self.layers[-1])
+        dLdC=dAdCost*derivative(-1)
         dLdCT=np.array([dLdC]).T
         self.dWeightsReversed.append(dLdCT*self.activations[-2])
         self.weights[-1]+=self.dWeightsReversed[0]
@@ -87,9 +97,9 @@ class neuralNetwork:
             i=-i-1
             #derivative of this activation (A) with respect to previous activation (Ap)
             #note that we're looping through activations backwards so the "previous" activation is a higher index activation
-            dAdC=np.dot(self.weights[i].T,dActivationFunction(np.array([self.layers[i]]).T)*self.dAdCostReversed[-1])
+            dAdC=np.dot(self.weights[i].T,np.array([derivative(i)]).T*self.dAdCostReversed[-1])
             self.dAdCostReversed.append(dAdC)
-            dWdA=np.array([dActivationFunction(self.layers[i-1])]).T*self.activations[i-2]
+            dWdA=np.array([derivative(i-1)]).T*self.activations[i-2]
             self.dWeightsReversed.append(dWdA)
             self.weights[i-1]+=self.dWeightsReversed[-1]
 
@@ -99,15 +109,41 @@ class neuralNetwork:
 def RPD(x,y):
     return 2*(x-y)/(np.abs(x)+np.abs(y))
 
-def testNet(inputs,labels,nTrials=1000,nLayers=1,nNodes=3):
+def testNet(inputs,labels,nTrials=1000,nLayers=1,nNodes=3,tol=1e-4,patience=50,minDelta=1e-6):
     net=neuralNetwork(xs[0],ys[0],nLayers=nLayers,nNodes=nNodes)
+    #the loss of each epoch (trial) is recorded in lossCurve, which is allocated for all nTrials up front.  It's summed from the final activations
+    #feedForward already produced, against the sigmoid of each label which only has to be computed once.
+    #Training stops early once the loss drops below tol or hasn't improved by more than minDelta in patience epochs
+    lossCurve=np.empty(nTrials)
+    targets=[sigmoid(y) for y in ys]
+    bestLoss=np.inf
+    sinceBest=0
+    #so nTrials=0 gives an empty loss curve
+    i=-1
     #train the net on the labelled dataset
     for i in range(nTrials):
-        for x,y in zip(xs,ys):
+        epochLoss=0
+        for x,y,target in zip(xs,ys,targets):
             net.x=x
             net.y=y
             net.feedForward()
-            net.backProp(dSigmoid,dSumSquaredErrors,sigmoid)
+            epochLoss+=np.sum(sumSquaredErrors(target,net.activations[-1]))
+            net.backProp(dCostFunction=dSumSquaredErrors,activationFunction=sigmoid)
+        lossCurve[i]=epochLoss/len(xs)
+        if lossCurve[i]<tol:
+            break
+        if lossCurve[i]<bestLoss-minDelta:
+            bestLoss=lossCurve[i]
+            sinceBest=0
+        else:
+            sinceBest+=1
+            if sinceBest>=patience:
+                break
+    lossCurve=lossCurve[:i+1]
+    if len(lossCurve):
+        print('Trained for {} of {} epochs, final loss {:.2e}.'.format(len(lossCurve),nTrials,lossCurve[-1]))
+    else:
+        print('Trained for 0 epochs.')
     #test the trained net on the dataset and display results
     #The result of the net is the last activation which is the output of a sigmoid function, so it's helpful to see both 
     #how close the inverse sigmoid of the activation is and how close the activation is to the sigmoid of the correct answer
@@ -130,6 +166,7 @@ def testNet(inputs,labels,nTrials=1000,nLayers=1,nNodes=3):
         #Because the range between sig(0) and sig(1) is smaller than that between 1 and 0, I scale the sigmoid space error up to make it comparable to the real space error.
         #A helpful result of this scaling is that if the relative error is less than 0.5, then we immediately know result would round to the correct value.
         print('Sigmoid Space: Final activation={:.2f}, correct answer={:.2f}, relative error={:.2f}.\n'.format(sigRes,sigSol,sigErr))
+    return lossCurve
 
 #Here I test if the net can learn an AND gate.  I'll test the net on a few subsets of each truth tabel and then the entire table.
 
@@ -0,0 +1,66 @@
+import numpy as np
+import json
+import time
+import platform
+import argparse
+from stringFuncs import stringSolver, implicitStringSolver, stableDt
+
+"""About this task:
+Times the implicit (Crank-Nicolson) string solver against the explicit one on fine grids, where the explicit scheme's dt<=dx/v limit means a lot of steps.
+The string is the one from vibrations.py (L=1, T=40, rho=0.01) plucked with a smooth bump at x=0.6 so both schemes converge to the same answer.
+
+For each grid the explicit solver is run at its largest stable dt, then the implicit solver is run over the same simulated time at a few
+Courant numbers (v*dt/dx) above 1, ie. with several times fewer steps.  Each run is repeated and the fastest kept.  The largest difference
+between the final rows of the two solvers is recorded as well, as the implicit solver's bigger steps cost some accuracy.
+
+Results are printed and written as json.  Run with -h for the options.
+"""
+
+def timeRun(makeSolver,nts,repeats):
+    #returns the fastest of repeats runs of nts steps from a fresh solver and the final row
+    best=np.inf
+    for i in range(repeats):
+        solver=makeSolver()
+        start=time.perf_counter()
+        ts,ys=solver.run(nts,every=nts)
+        best=min(best,time.perf_counter()-start)
+    return best,ys[-1]
+
+def runBenchmark(nxss,courants,tmax,repeats):
+    records=[]
+    for nxs in nxss:
+        dx=1/nxs
+        xs=np.linspace(0,1,nxs+1)
+        x0=.02*np.exp(-np.square((xs-.6)/.05))
+        x0[0]=x0[-1]=0
+        Ts=np.full(nxs+1,40.)
+        rhos=np.full(nxs+1,.01)
+        nts=int(np.ceil(tmax/stableDt(Ts,rhos,dx)))
+        explicitSeconds,explicitRow=timeRun(lambda:stringSolver(x0,Ts,rhos,dx,tmax/nts),nts,repeats)
+        records.append({'solver':'explicit','nxs':nxs,'courant':float(np.sqrt(40/.01)*tmax/nts/dx),'steps':nts,'seconds':explicitSeconds,
+                        'speedup':1.0,'maxDifference':0.0})
+        print('nxs={:<6}  explicit           {:>7} steps {:.4f}s'.format(nxs,nts,explicitSeconds))
+        for courant in courants:
+            steps=int(np.ceil(nts/courant))
+            seconds,row=timeRun(lambda:implicitStringSolver(x0,Ts,rhos,dx,tmax/steps),steps,repeats)
+            records.append({'solver':'implicit','nxs':nxs,'courant':courant,'steps':steps,'seconds':seconds,
+                            'speedup':explicitSeconds/seconds,'maxDifference':float(np.max(np.abs(row-explicitRow)))})
+            print('nxs={:<6}  implicit courant={:<3} {:>5} steps {:.4f}s  speedup {:.2f}x  difference {:.2e}'.format(
+                nxs,courant,steps,seconds,records[-1]['speedup'],records[-1]['maxDifference']))
+    return records
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Compare the explicit and implicit string solvers in stringFuncs')
+    parser.add_argument('--nxs',type=int,nargs='+',default=[1000,2000,4000])
+    parser.add_argument('--courant',type=float,nargs='+',default=[2,5,20])
+    parser.add_argument('--tmax',type=float,default=.01)
+    parser.add_argument('--repeats',type=int,default=3)
+    parser.add_argument('--output',default='stringBenchmarkResults.json')
+    args=parser.parse_args()
+
+    records=runBenchmark(args.nxs,args.courant,args.tmax,args.repeats)
+    results={'python':platform.python_version(),'numpy':np.__version__,'machine':platform.machine(),
+             'time':time.strftime('%Y-%m-%dT%H:%M:%S'),'settings':vars(args),'results':records}
+    with open(args.output,'w') as f:
+        json.dump(results,f,indent=1)
+    print('\nresults written to {}'.format(args.output))
@@ -0,0 +1,273 @@
+import numpy as np
+from collections import namedtuple
+from scipy.linalg import lapack
+
+"""About this file:
+Functions for numerically solving the wave equation on a string, pulled out of vibrations.py so they can be reused.
+The string is broken up into nxs+1 x positions and stepped forward in time, with each new row of amplitudes calculated from the two rows before it.
+Every time step is a single sliced numpy update over the whole string rather than a python loop over x positions.
+stringSolver only holds the last few rows in memory and keeps a decimated record, for long runs or fine grids where the full lattice won't fit.
+The steps work on the last axis of the arrays passed in, so sweepString can step many strings with different parameters together as one (scenarios,x) array.
+implicitStringSolver is a Crank-Nicolson version that is stable for any dt, for fine grids or long runs where dt<=dx/v would take too many steps.
+"""
+
+#returns v^2/v'^2 at every x position.  This only depends on the string and the step sizes so it is calculated once per run, not at every point and step
+def getv2(Tvec,rhovec,dx,dt):
+    v=np.sqrt(np.asarray(Tvec,dtype=float)/rhovec)
+    vprime=dx/dt
+    return np.square(v)/np.square(vprime)
+
+#returns the coefficient multiplying the change in y over the last step in the frictional term 2*k*dx*(y1-y0)/dt
+def getDamping(k,dx,dt):
+    return 2*k*dx/dt
+
+#the frictional term in the explicit stepping acts like the damping rate gamma in y_tt=v^2*y_xx-gamma*y_t.  Returns that gamma for a friction k at step dt,
+#so an implicitStringSolver run can be given the same friction as an explicit one
+def frictionRate(k,dx,dt):
+    return getDamping(k,dx,dt)/dt
+
+#the Courant number v*dt/dx at the fastest point on the string.  Without friction the time stepping is only stable if this is at most 1,
+#ie. dx/dt is at least the largest wave speed sqrt(T/rho)
+def courantNumber(Ts,rhos,dx,dt):
+    return np.sqrt(np.max(getv2(Ts,rhos,dx,dt)))
+
+#checks the time stepping will stay bounded before anything is run.  Working through the growth of a single sine shaped wave of every wavelength
+#the scheme is stable when v^2/v'^2+damping/2<=1 everywhere (and damping<=2), which is the Courant condition when there's no friction.
+#a tiny tolerance lets dt sit exactly on the limit despite rounding
+def isStable(Ts,rhos,dx,dt,k=0):
+    damping=np.max(getDamping(np.asarray(k),dx,dt))
+    return bool(np.max(getv2(Ts,rhos,dx,dt))+damping/2<=1+1e-12 and damping<=2)
+
+#returns the largest dt that is stable for the string, times courant (at most 1) for a margin.  Fewer, larger steps are cheaper and for this scheme
+#the error shrinks as the Courant number approaches 1 (it is exact there for a uniform string) so the limit is also the most accurate choice.
+#With friction the stable dts are those where vmax^2*dt^2/dx^2+k*dx/dt<=1, the largest of which is a root of the cubic below
+def stableDt(Ts,rhos,dx,k=0,courant=1):
+    vmax=np.sqrt(np.max(np.asarray(Ts,dtype=float)/rhos))
+    kmax=np.max(k)
+    if kmax==0:
+        dt=dx/vmax
+    else:
+        roots=np.roots([np.square(vmax/dx),0,-1,kmax*dx])
+        roots=roots[np.isreal(roots)].real
+        roots=roots[roots>0]
+        if len(roots)==0:
+            raise ValueError('no time step is stable with friction k={} and dx={}'.format(kmax,dx))
+        dt=np.max(roots)
+    dt*=courant
+    if not isStable(Ts,rhos,dx,dt,k):
+        raise ValueError('dt={:.3e} from courant={} is not stable, the friction needs a larger step'.format(dt,courant))
+    return dt
+
+#returns the x values for the first time step.  Seperate function required because the time stepping algorithm needs two time steps back,
+#this one uses the 0 derivative at t=0 instead.  There's no frictional term because dy/dt at the first step is definitionally 0.
+#the left end of the string is fixed at 0 and the right end is set to end (0 unless it is being driven)
+def firstStep(vec1,v2,end=0,out=None):
+    if out is None:
+        out=np.empty(np.shape(vec1))
+    out[...,1:-1]=vec1[...,1:-1]+.5*v2[...,1:-1]*(vec1[...,2:]+vec1[...,:-2]-2*vec1[...,1:-1])
+    out[...,0]=0
+    out[...,-1]=end
+    return out
+
+#returns the x values one time step after vec1 given the last two rows vec0 and vec1.  damping is getDamping(k,dx,dt), 0 for no friction.
+#out can be vec0 as the whole interior is calculated before it is written
+def nextStep(vec0,vec1,v2,end=0,damping=0,out=None):
+    if out is None:
+        out=np.empty(np.shape(vec1))
+    if np.any(damping):
+        #frictional term subtracted from the change in y value, with dy/dt taken from the difference in the last two rows
+        out[...,1:-1]=2*vec1[...,1:-1]-vec0[...,1:-1]+v2[...,1:-1]*(vec1[...,2:]+vec1[...,:-2]-2*vec1[...,1:-1])-damping*(vec1[...,1:-1]-vec0[...,1:-1])
+    else:
+        out[...,1:-1]=2*vec1[...,1:-1]-vec0[...,1:-1]+v2[...,1:-1]*(vec1[...,2:]+vec1[...,:-2]-2*vec1[...,1:-1])
+    out[...,0]=0
+    out[...,-1]=end
+    return out
+
+class stringSolver:
+    #steps a string forward in time keeping only the last two time rows and the row being written in a 3 row ring buffer, so the memory used
+    #doesn't grow with the length of the simulation.  run only stores what is asked for: every Nth time row and/or a chosen set of x positions (probes).
+    #drive sets the right end of the string: None for a fixed end, an array of values at every time step or a function of time.  k is the friction, 0 for none
+    #x0, Ts and rhos can also be (scenarios,x) arrays to step several strings at once, with k a (scenarios,1) column and the drive giving one value per scenario
+    def __init__(self,x0,Ts,rhos,dx,dt,k=0,drive=None):
+        self.v2=getv2(Ts,rhos,dx,dt)
+        self.damping=getDamping(k,dx,dt)
+        self.dt=dt
+        self.drive=drive
+        self.rows=np.zeros((3,)+np.shape(x0))
+        self.rows[0]=x0
+        #index of the newest time row, which is held in rows[step%3]
+        self.step=0
+        #step a run with a limit stopped at, None if it hasn't
+        self.diverged=None
+
+    def end(self,step):
+        if self.drive is None:
+            return 0
+        if callable(self.drive):
+            return self.drive(step*self.dt)
+        return self.drive[step]
+
+    def current(self):
+        return self.rows[self.step%3]
+
+    def advance(self):
+        #moves forward one time step, overwriting the oldest row, and returns the new row
+        step=self.step+1
+        if step==1:
+            firstStep(self.rows[0],self.v2,end=self.end(1),out=self.rows[1])
+        else:
+            nextStep(self.rows[(step-2)%3],self.rows[(step-1)%3],self.v2,end=self.end(step),damping=self.damping,out=self.rows[step%3])
+        self.step=step
+        return self.rows[step%3]
+
+    def run(self,nts,every=1,probes=None,limit=None):
+        #advances nts time steps and returns (ts,ys): the times of the kept rows and their y values, at the probe x indices if given.
+        #Rows are kept when their step is a multiple of every.  The starting row is included on the first run; later runs carry on from where the last stopped.
+        #If limit is given the run stops as soon as any amplitude is past it (or not finite), the step is recorded in diverged and only the rows kept so far are returned
+        first=self.step if self.step==0 else self.step+1
+        steps=np.arange(first,self.step+nts+1)
+        steps=steps[steps%every==0]
+        columns=slice(None) if probes is None else np.asarray(probes)
+        width=self.rows.shape[-1] if probes is None else len(columns)
+        ys=np.empty((len(steps),)+self.rows.shape[1:-1]+(width,))
+        kept=0
+        if len(steps) and steps[0]==self.step:
+            ys[0]=self.current()[...,columns]
+            kept=1
+        for i in range(nts):
+            row=self.advance()
+            if kept<len(steps) and self.step==steps[kept]:
+                ys[kept]=row[...,columns]
+                kept+=1
+            if limit is not None and not np.max(np.abs(row))<=limit:
+                self.diverged=self.step
+                break
+        return steps[:kept]*self.dt,ys[:kept]
+
+#factors a symmetric positive definite tridiagonal matrix, given its diagonal and off diagonal (one shorter), as L*D*L^T with LAPACK's pttrf.
+#Works along the last axis so a stack of systems (one per scenario) is factored at once.  Returns a list of (index,factors) for the systems in the stack,
+#which can be reused for every solve with the same matrix
+def tridiagonalFactor(diag,off):
+    diag=np.asarray(diag,dtype=float)
+    off=np.broadcast_to(off,diag.shape[:-1]+(diag.shape[-1]-1,))
+    factors=[]
+    for index in np.ndindex(diag.shape[:-1]):
+        d,e,info=lapack.dpttrf(diag[index],off[index])
+        if info!=0:
+            raise np.linalg.LinAlgError('tridiagonal matrix is not positive definite')
+        factors.append((index,(d,e)))
+    return factors
+
+#solves the tridiagonal systems from tridiagonalFactor for the right hand side rhs in O(n) with LAPACK's pttrs.  out can be rhs
+def tridiagonalSolve(factors,rhs,out=None):
+    if out is None:
+        out=np.empty(np.shape(rhs))
+    for index,(d,e) in factors:
+        row=out[index]
+        if not np.shares_memory(row,rhs):
+            row[...]=rhs[index]
+        #a contiguous row viewed as an (n,1) column is fortran ordered so pttrs solves it in place
+        solution,info=lapack.dpttrs(d,e,row[:,np.newaxis],overwrite_b=True)
+        if not np.shares_memory(solution,row):
+            row[...]=solution[:,0]
+    return out
+
+class implicitStringSolver(stringSolver):
+    #Crank-Nicolson time stepping: the second difference in x is averaged over the new, current and last rows (weights 1/4,1/2,1/4) and the friction
+    #is centered on the current row, which makes the scheme stable for any dt.  Each step solves a tridiagonal system for the new row, and as the
+    #coefficients don't change during a run the matrix is factored once up front and each step is only an O(n) solve in LAPACK.
+    #gamma is the damping rate in y_tt=v^2*y_xx-gamma*y_t, see frictionRate to match an explicit run's k.  Otherwise used exactly like stringSolver
+    def __init__(self,x0,Ts,rhos,dx,dt,gamma=0,drive=None):
+        stringSolver.__init__(self,x0,Ts,rhos,dx,dt,drive=drive)
+        #row i of the system is q(i)*(-y(i-1)+(2+(1+g)/q(i))*y(i)-y(i+1)), with q a quarter of v^2/v'^2 and g=gamma*dt/2.  Dividing each row by its q leaves
+        #a symmetric, diagonally dominant matrix (-1 off the diagonal) which LAPACK can factor without pivoting.  Only the interior is solved for
+        inverseQuarter=4/self.v2[...,1:-1]
+        halfDamping=np.asarray(gamma,dtype=float)*dt/2
+        #the right hand side is 1/q*(2*y1-(1-g)*y0) plus the second difference of the known rows, with these coefficients worked out once
+        self.currentWeight=2*inverseQuarter
+        self.lastWeight=(1-halfDamping)*inverseQuarter
+        self.inverseQuarter=inverseQuarter
+        #the first step starts from rest so the friction cancels, leaving a different matrix to every later step
+        self.firstFactors=tridiagonalFactor(2+inverseQuarter,-1)
+        self.factors=tridiagonalFactor(2+(1+halfDamping)*inverseQuarter,-1)
+        self.known=np.empty(self.rows.shape[1:])
+
+    def advance(self):
+        step=self.step+1
+        vec1=self.rows[(step-1)%3]
+        out=self.rows[step%3]
+        end=self.end(step)
+        if step==1:
+            #zero starting velocity means the row before the start mirrors the first step
+            known=vec1
+            rhs=self.inverseQuarter*vec1[...,1:-1]
+            factors=self.firstFactors
+        else:
+            vec0=self.rows[(step-2)%3]
+            #the averaged second difference of the known rows is the second difference of 2*y1+y0
+            known=np.multiply(vec1,2,out=self.known)
+            known+=vec0
+            rhs=self.currentWeight*vec1[...,1:-1]
+            rhs-=self.lastWeight*vec0[...,1:-1]
+            factors=self.factors
+        rhs+=known[...,2:]
+        rhs+=known[...,:-2]
+        rhs-=2*known[...,1:-1]
+        #the new right end value is known, so its part of the new row's second difference moves to the right hand side
+        rhs[...,-1]+=end
+        tridiagonalSolve(factors,rhs,out=out[...,1:-1])
+        out[...,0]=0
+        out[...,-1]=end
+        self.step=step
+        return out
+
+#solves the string up to tmax after checking the time step is stable.  If dt is None the largest stable dt (times courant) is used, shrunk slightly
+#so a whole number of steps lands on tmax.  A dt that isn't stable raises a ValueError before any stepping is done.  The run is also stopped early,
+#with a FloatingPointError, if any amplitude grows past growth times the largest starting or driven amplitude.
+#drive is as in stringSolver, a function of time is the simplest as the step count isn't known in advance.  Returns (ts,ys) like stringSolver.run
+def solveStable(x0,Ts,rhos,dx,tmax,dt=None,k=0,drive=None,courant=1,every=1,probes=None,growth=1e3):
+    if dt is None:
+        dt=stableDt(Ts,rhos,dx,k,courant)
+        nts=int(np.ceil(tmax/dt-1e-9))
+        dt=tmax/nts
+    else:
+        nts=int(round(tmax/dt))
+    if not isStable(Ts,rhos,dx,dt,k):
+        raise ValueError('dt={:.3e} is unstable: the Courant number is {:.3f}, the largest stable dt is {:.3e}'.format(dt,courantNumber(Ts,rhos,dx,dt),stableDt(Ts,rhos,dx,k)))
+    scale=np.max(np.abs(x0))
+    if drive is not None and not callable(drive):
+        scale=max(scale,np.max(np.abs(drive)))
+    solver=stringSolver(x0,Ts,rhos,dx,dt,k=k,drive=drive)
+    ts,ys=solver.run(nts,every=every,probes=probes,limit=growth*scale if scale>0 else None)
+    if solver.diverged is not None:
+        raise FloatingPointError('solution diverged at t={:.3e} after {} of {} steps'.format(solver.diverged*dt,solver.diverged,nts))
+    return ts,ys
+
+#solves for nts time steps from the starting amplitudes x0 and returns the whole (nts+1,len(x0)) lattice of y values.
+#ends is the right end value at every time row (len nts+1) for a driven string, None for a fixed end.  k is the friction, 0 for none.
+def solveString(x0,Ts,rhos,dx,dt,nts,ends=None,k=0):
+    return stringSolver(x0,Ts,rhos,dx,dt,k=k,drive=ends).run(nts)[1]
+
+#the parameters of one scenario in sweepString's results
+sweepCase=namedtuple('sweepCase',['T','rho','alpha_r','alpha_T','k','A','omega'])
+
+#solves the same plucked string for every combination of parameters at once.  The parameters are broadcast against each other, so pass arrays for the
+#ones being swept and single values for the rest.  Each scenario has tension T*exp(alpha_T*x), density rho*exp(alpha_r*x), friction k and its right end driven by A*sin(omega*t).
+#All the scenarios are stepped together as one (scenarios,x) array so each time step is a single vectorized update over the whole sweep.
+#Returns the kept times and a list of (sweepCase(T,rho,alpha_r,alpha_T,k,A,omega),ys) pairs, one per scenario in the order they were given
+#(so scenarios with the same parameters each get their own entry).  every and probes are as in stringSolver.run
+def sweepString(x0,xs,dx,dt,nts,T=40,rho=0.01,alpha_r=0,alpha_T=0,k=0,A=0,omega=0,every=1,probes=None):
+    cases=np.broadcast_arrays(*[np.atleast_1d(np.asarray(parameter,dtype=float)) for parameter in (T,rho,alpha_r,alpha_T,k,A,omega)])
+    T,rho,alpha_r,alpha_T,k,A,omega=[parameter[:,None] for parameter in cases]
+    Ts=T*np.exp(alpha_T*xs)
+    rhos=rho*np.exp(alpha_r*xs)
+    starts=np.repeat(np.asarray(x0,dtype=float)[None],len(Ts),axis=0)
+    drive=None
+    if np.any(A[:,0]):
+        A,omega=A[:,0],omega[:,0]
+        drive=lambda t:A*np.sin(omega*t)
+    ts,ys=stringSolver(starts,Ts,rhos,dx,dt,k=k,drive=drive).run(nts,every=every,probes=probes)
+    results=[]
+    for i in range(len(starts)):
+        results.append((sweepCase(*[float(parameter[i]) for parameter in cases]),ys[:,i]))
+    return ts,results
@@ -1,5 +1,6 @@
 import numpy as np 
 import matplotlib.pyplot as plt 
+from stringFuncs import solveString, stringSolver, sweepString, courantNumber, stableDt
 
 """About this task:
 This file is exploring the conceptually simple situation of a plucked string vibrating.  
@@ -52,66 +53,22 @@ dt=.0001
 #total steps
 nxs=int(L/dx)
 nts=int(tmax/dt)
-#vectors to be put together to form lattice of x,t space to plot y values
+#x and t values the y values are plotted against
 xs=np.linspace(0,1,nxs+1)
 ts=np.linspace(0,tmax,nts+1)
 #vectors that hold value of tension and rho at all points on x.  Constant now but changes later
 Ts=np.repeat(T,np.shape(xs))
 rhos=np.repeat(rho,np.shape(xs))
 
-#create x,t space and fill the first time row with a perterbation at x=.8m
-lattice,a=np.meshgrid(xs,ts)
+#the starting amplitudes: a perterbation at x=.8m
 x0=np.zeros(np.shape(xs))
 x0[80]=.02
-ys=np.zeros(np.shape(lattice))
-ys[0]=x0
-
-#function that returns v^2/v'^2 important in time stepping algorithm
-def getv2(i,Tvec,rhovec):
-    v=np.sqrt(Tvec[i]/rhovec[i])
-    vprime=dx/dt
-    v2=np.square(v)/np.square(vprime)
-    return v2
-#function that returns x values for first time step.  Seperate function required because the time stepping algorithm requires two time steps back, but a new algorithm can be used that 
-#implements the 0 derivative at t=0
-def firstStep(vec1,Tvec,rhovec,end=0,Fric=False):
-    #nextvec is the vector of x values at the t value one time stap ahead of the input vec1.  The left hand side of our string is fixed at 0 amplitude, so the first entry is always 0.
-    nextVec=np.array([0])
-    for i in range(1,len(vec1)-1):
-        #new is the value of amplitude after i timesteps.
-        new=vec1[i]+.5*getv2(i,Tvec,rhovec)*(vec1[i+1]+vec1[i-1]-2*vec1[i])
-        nextVec=np.append(nextVec,new)
-        #Optional friction term, set to 0 because dy/dt at the first step is definitionally 0.  Included for symmetry with generalized timestep algorithm.
-        if Fric:
-            new-=0
-        #appends the value of y at right hand end of string.  Constant 0 by defualt but can be changed for part f.
-    nextVec=np.append(nextVec,end)
-    return nextVec
-#identical to firstStep except for equation for new and Frictional term
-def nextStep(vec0,vec1,Tvec,rhovec,end=0,Fric=False):
-    nextVec=np.array([0])
-    
-    for i in range(1,len(vec1)-1):
-        #algorithm for time step given last two vectors of x values.
-        new=2*vec1[i]-vec0[i]+getv2(i,Tvec,rhovec)*(vec1[i+1]+vec1[i-1]-2*vec1[i])
-        
-        if Fric:
-            #frictional force subtracted from change in y value.  dx/dt defined by difference in last two points.  It doesn't really make
-            #physical sense to subtract a force from an amplitude, so this is incorrect, but I don't know where else to implement the term.
-            #Post grading comment: I received full marks on this assignment, so apparently this was correct.
-            new-=2*k*dx*(vec1[i]-vec0[i])/dt
-        nextVec=np.append(nextVec,new)
-    nextVec=np.append(nextVec,end)
-    return nextVec
 
 #solution for part a
 #the plot produced is a fairly standard looking solution to the wave equation.  I find the reflected wave from the right edge causing interference particularly interesting.
 if 'a' in parts:
-    #get first set of x values from first step algorithm
-    ys[1]=firstStep(ys[0],Ts,rhos)
-    for i in range(2,nts+1):
-        #repeat stepping algorithm until max time
-        ys[i]=nextStep(ys[i-2],ys[i-1],Ts,rhos)
+    #step the string forward from the initial pluck until max time
+    ys=solveString(x0,Ts,rhos,dx,dt,nts)
     #plotting
     fig,ax=plt.subplots()
     ax.set_xlabel('x position (m)')
@@ -137,17 +94,14 @@ nts=int(tmax/dt)
 xs=np.linspace(0,1,nxs+1)
 ts=np.linspace(0,tmax,nts+1)
 
-lattice,a=np.meshgrid(xs,ts)
 x0=np.zeros(np.shape(xs))
 x0[80]=.02
 
-ys=np.zeros(np.shape(lattice))
-ys[0]=x0
 #The produced plots have exponentially growing values for the amplitude indicated by the enormous scale of the colorbar
 if 'b' in parts:
-    ys[1]=firstStep(ys[0],Ts,rhos)
-    for i in range(2,nts+1):
-        ys[i]=nextStep(ys[i-2],ys[i-1],Ts,rhos)
+    #the stability check in stringFuncs catches this before anything is run, solveStable would refuse this dt.  It's run anyway here to see what goes wrong
+    print('Part b: the Courant number is {:.2f} (stable at 1 or less), the largest stable dt is {:.2e} s'.format(courantNumber(Ts,rhos,dx,dt),stableDt(Ts,rhos,dx)))
+    ys=solveString(x0,Ts,rhos,dx,dt,nts)
     fig,ax=plt.subplots()
     ax.set_xlabel('x position (m)')
     ax.set_ylabel('Time (s)')
@@ -179,19 +133,14 @@ Ts=np.repeat(T,np.shape(xs))
 rhos=np.repeat(rho,np.shape(xs))
 
 
-lattice,a=np.meshgrid(xs,ts)
 x0=np.zeros(np.shape(xs))
 x0[80]=.02
 
-ys=np.zeros(np.shape(lattice))
-ys[0]=x0
 
 k=0.001
 #again, I don't think these are right, but the waves do die off which is consistent with the addition of a frictional force
 if 'd' in parts:
-    ys[1]=firstStep(ys[0],Ts,rhos,Fric=True)
-    for i in range(2,nts+1):
-        ys[i]=nextStep(ys[i-2],ys[i-1],Ts,rhos,Fric=True)
+    ys=solveString(x0,Ts,rhos,dx,dt,nts,k=k)
     fig,ax=plt.subplots()
     ax.set_xlabel('x position (m)')
     ax.set_ylabel('Time (s)')
@@ -205,9 +154,9 @@ if 'd' in parts:
 
 #following code is identical to part a except for the functional dependance of rho and T on x.
 
-#here the alpha term in both functions are the same
-alpha_r=1
-alpha_T=1
+#both pairs of alphas are solved together in one sweep.  First the alpha term in both functions are the same, then alpha_T=10*alpha_rho
+alpha_rs=np.array([1,.1])
+alpha_Ts=np.array([1,1])
 tmax=0.01
 dx=.01
 dt=.0001
@@ -217,66 +166,25 @@ nts=int(tmax/dt)
 
 xs=np.linspace(0,1,nxs+1)
 ts=np.linspace(0,tmax,nts+1)
-rhos=rho*np.exp(alpha_r*xs)
 
-Ts=T*np.exp(alpha_T*xs)
 
-
-lattice,a=np.meshgrid(xs,ts)
 x0=np.zeros(np.shape(xs))
 x0[80]=.02
 
-ys=np.zeros(np.shape(lattice))
-ys[0]=x0
 #plot for equal alphas is identical to the plot in part a as expected
-if 'e' in parts:
-    ys[1]=firstStep(ys[0],Ts,rhos)
-    for i in range(2,nts+1):
-        ys[i]=nextStep(ys[i-2],ys[i-1],Ts,rhos)
-    fig,ax=plt.subplots()
-    ax.set_xlabel('x position (m)')
-    ax.set_ylabel('Time (s)')
-    ax.set_title('Magnitude of Wave: Part e.  alpha_T=alpha_rho (m)')
-    h = plt.contourf(xs,ts,ys)
-    fig.colorbar(h, ax=ax)
-    plt.show()
-
-#the following code does the same as above but with differnt alpha values for rho and T
-alpha_r=.1
-alpha_T=1
-tmax=0.01
-dx=.01
-dt=.0001
-nxs=int(L/dx)
-
-nts=int(tmax/dt)
-
-xs=np.linspace(0,1,nxs+1)
-ts=np.linspace(0,tmax,nts+1)
-rhos=rho*np.exp(alpha_r*xs)
-
-Ts=T*np.exp(alpha_T*xs)
-
-
-lattice,a=np.meshgrid(xs,ts)
-x0=np.zeros(np.shape(xs))
-x0[80]=.02
-
-ys=np.zeros(np.shape(lattice))
-ys[0]=x0
 #plots for alpha_T=10*alpha_rho
 #here we observe a curved drifting of the peaks centered at 0.8m which were static before
 if 'e' in parts:
-    ys[1]=firstStep(ys[0],Ts,rhos)
-    for i in range(2,nts+1):
-        ys[i]=nextStep(ys[i-2],ys[i-1],Ts,rhos)
-    fig,ax=plt.subplots()
-    ax.set_xlabel('x position (m)')
-    ax.set_ylabel('Time (s)')
-    ax.set_title('Magnitude of Wave: Part e.  alpha_T=10*alpha_rho (m)')
-    h = plt.contourf(xs,ts,ys)
-    fig.colorbar(h, ax=ax)
-    plt.show()
+    ts,results=sweepString(x0,xs,dx,dt,nts,T=T,rho=rho,alpha_r=alpha_rs,alpha_T=alpha_Ts)
+    titles=['alpha_T=alpha_rho','alpha_T=10*alpha_rho']
+    for title,(case,ys) in zip(titles,results):
+        fig,ax=plt.subplots()
+        ax.set_xlabel('x position (m)')
+        ax.set_ylabel('Time (s)')
+        ax.set_title('Magnitude of Wave: Part e.  {} (m)'.format(title))
+        h = plt.contourf(xs,ts,ys)
+        fig.colorbar(h, ax=ax)
+        plt.show()
 
 
 #f)A standing wave with a node at one end and antinode at the other would require that the wave be a quarter period father along in its cycle than a
@@ -305,17 +213,13 @@ Ts=np.repeat(T,np.shape(xs))
 rhos=np.repeat(rho,np.shape(xs))
 
 
-lattice,a=np.meshgrid(xs,ts)
 x0=np.zeros(np.shape(xs))
 x0[80]=.02
 
-ys=np.zeros(np.shape(lattice))
-ys[0]=x0
 #plotting for part f
 if 'f' in parts:
-    ys[1]=firstStep(ys[0],Ts,rhos,end=y0[1])
-    for i in range(2,nts+1):
-        ys[i]=nextStep(ys[i-2],ys[i-1],Ts,rhos,end=y0[i])
+    #this run is 10x longer than the others so only every 10th time row is kept, the solver holds just the last few rows while it steps
+    ts,ys=stringSolver(x0,Ts,rhos,dx,dt,drive=y0).run(nts,every=10)
     fig,ax=plt.subplots()
     ax.set_xlabel('x position (m)')
     ax.set_ylabel('Time (s)')